@@ -1,15 +1,134 @@
-from utils  import distance
+import numpy as np
+
+from utils import EARTH_RADIUS_MILES, distance
+
+
 class Shop():
-    def __init__(self, shop_id, shop_name, shop_address, shop_lat, shop_long, shop_radius):
+    __slots__ = ("shop_id", "shop_name", "shop_address", "shop_lat", "shop_long", "shop_radius", "shop_type")
+
+    def __init__(self, shop_id, shop_name, shop_address, shop_lat, shop_long, shop_radius, shop_type=None):
         self.shop_id = shop_id
         self.shop_name = shop_name
         self.shop_address = shop_address
         self.shop_lat = shop_lat
         self.shop_long = shop_long
         self.shop_radius = shop_radius
+        self.shop_type = shop_type
 
     def __str__(self):
         return f"{self.shop_id} - {self.shop_name} - {self.shop_address} - {self.shop_lat} - {self.shop_long} - {self.shop_radius}"
-    
+
     def calculate_distance(self, user_lat, user_long):
-        return distance((self.shop_lat, self.shop_long), (user_lat, user_long)).miles
\ No newline at end of file
+        """Great-circle distance in miles from the user to this shop."""
+        return distance((self.shop_lat, self.shop_long), (user_lat, user_long))
+
+
+class ShopCollection():
+    """
+    Struct-of-arrays store for many shops: one NumPy array per field instead
+    of one Shop object per record. Distances from one or many user points are
+    computed in a single vectorized call, with each shop's latitude/longitude
+    terms precomputed once.
+
+    Indexing with an int returns a Shop; with a slice, mask or index array it
+    returns a smaller ShopCollection.
+    """
+
+    FIELDS = ("ids", "names", "addresses", "lats", "longs", "radii", "types")
+
+    def __init__(self, ids, names, addresses, lats, longs, radii=None, types=None):
+        n = len(lats)
+        self.ids = np.asarray(ids)
+        self.names = np.asarray(names, dtype=object)
+        self.addresses = np.asarray(addresses, dtype=object)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.longs = np.asarray(longs, dtype=np.float64)
+        self.radii = np.full(n, np.nan) if radii is None else np.asarray(radii, dtype=np.float64)
+        self.types = np.full(n, None, dtype=object) if types is None else np.asarray(types, dtype=object)
+        for field in self.FIELDS:
+            if len(getattr(self, field)) != n:
+                raise ValueError(f"{field} has {len(getattr(self, field))} entries, expected {n}")
+        self._lat_rad = np.radians(self.lats)
+        self._long_rad = np.radians(self.longs)
+        self._cos_lat = np.cos(self._lat_rad)
+
+    @classmethod
+    def from_shops(cls, shops):
+        shops = list(shops)
+        return cls([s.shop_id for s in shops], [s.shop_name for s in shops], [s.shop_address for s in shops],
+                   [s.shop_lat for s in shops], [s.shop_long for s in shops], [s.shop_radius for s in shops],
+                   [s.shop_type for s in shops])
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        From a DataFrame with latitude/longitude columns (e.g. generate_data.generate_shops)
+        and optional osm_id, name, address, type and radius columns.
+        """
+        n = len(df)
+        column = lambda name, default: df[name].to_numpy() if name in df else default
+        return cls(column("osm_id", np.arange(n)), column("name", np.full(n, None, dtype=object)),
+                   column("address", np.full(n, None, dtype=object)), df["latitude"].to_numpy(),
+                   df["longitude"].to_numpy(), column("radius", None), column("type", None))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Shop(self.ids[index], self.names[index], self.addresses[index], float(self.lats[index]),
+                        float(self.longs[index]), float(self.radii[index]), self.types[index])
+        return ShopCollection(*(getattr(self, field)[index] for field in self.FIELDS))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def distances(self, user_lat, user_long):
+        """
+        Great-circle distances in miles.
+
+        :param user_lat: A latitude, or an array of m latitudes.
+        :param user_long: The matching longitude(s).
+        :return: Array of shape (n,) for one point, or (m, n) for m points.
+        """
+        lat = np.radians(np.asarray(user_lat, dtype=np.float64))[..., np.newaxis]
+        lon = np.radians(np.asarray(user_long, dtype=np.float64))[..., np.newaxis]
+        a = np.sin((self._lat_rad - lat) / 2) ** 2 + \
+            np.cos(lat) * self._cos_lat * np.sin((self._long_rad - lon) / 2) ** 2
+        return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def within(self, user_lat, user_long, radius_miles):
+        """Indices of shops within radius_miles of the user, nearest first."""
+        dists = self.distances(user_lat, user_long)
+        idx = np.flatnonzero(dists <= radius_miles)
+        return idx[np.argsort(dists[idx], kind="stable")]
+
+    def reaching(self, user_lat, user_long):
+        """Indices of shops whose own shop_radius covers the user."""
+        return np.flatnonzero(self.distances(user_lat, user_long) <= self.radii)
+
+    def nearest(self, user_lat, user_long, k):
+        """Indices of the k nearest shops, nearest first."""
+        dists = self.distances(user_lat, user_long)
+        k = min(k, len(dists))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        idx = np.argpartition(dists, k - 1)[:k] if k < len(dists) else np.arange(len(dists))
+        return idx[np.argsort(dists[idx], kind="stable")]
+
+    def count_within(self, user_lats, user_longs, radius_miles, memory_budget=32 * 1024 * 1024):
+        """
+        Number of shops within radius_miles of each of m user points. Points are
+        processed in chunks so the (m, n) distance matrix never has to exist in
+        full: each chunk's float64 matrix takes at most memory_budget bytes (the
+        haversine temporaries take a few times that), whatever the number of shops.
+        """
+        user_lats = np.atleast_1d(np.asarray(user_lats, dtype=np.float64))
+        user_longs = np.atleast_1d(np.asarray(user_longs, dtype=np.float64))
+        counts = np.empty(len(user_lats), dtype=np.int64)
+        chunk_size = max(1, memory_budget // (8 * max(1, len(self))))
+        for start in range(0, len(user_lats), chunk_size):
+            stop = start + chunk_size
+            counts[start:stop] = (self.distances(user_lats[start:stop], user_longs[start:stop]) <= radius_miles).sum(axis=1)
+        return counts
@@ -1,38 +1,87 @@
+import argparse
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-
-# World size is 100x100
-# Create 50 random points for each of 3 classes with 2 sepeate clusters
-
-# np.random.seed(0)
-N_Types = 3
-N_clusters = 2
-
-# data = pd.DataFrame({'x': x, 'y': y, 'shop_type': shop_type})
-data = pd.DataFrame(columns=['x', 'y', 'shop_type'])
-
-for shop_type in range(N_Types):
-    # Create 2 gaussian clusters for each shop type with 60% and 40% of the points
-    for cluster in range(N_clusters):
-        N_points = 50
-        if cluster == 0:
-            N_points = 30
-        #  The Cluster Centers need to spread randomly
-        center = np.random.rand(2) * 100
-        #  The Cluster Spread needs to be random
-        spread = np.random.rand(2) * 50
-        x = np.random.normal(center[0], spread[0], N_points)
-        y = np.random.normal(center[1], spread[1], N_points)
-        
-        plt.scatter(x, y,color = ['red', 'green', 'blue'][shop_type])
-        
-        #  Save the data to a csv file
-        data = pd.concat([data, pd.DataFrame({'x': x, 'y': y, 'shop_type': shop_type})])
-        # (pd.DataFrame({'x': x, 'y': y, 'shop_type': shop_type}))
-        # data.to_csv(f"shop_data.csv", index=False)
-        
-data.to_csv(f"shop_data.csv", index=False)       
-plt.savefig("shop_data.png")        
-plt.show()
 
+# Minneapolis, roughly downtown.
+DEFAULT_CENTER = (44.9778, -93.2650)
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def generate_shops(n=150, k_types=3, center=DEFAULT_CENTER, clusters=2, spread_miles=(0.3, 2.0),
+                   city_radius_miles=5.0, type_names=None, seed=None):
+    """
+    Synthetic shops in gaussian clusters around a city.
+
+    Each shop type gets `clusters` clusters whose centers are spread uniformly
+    over a disc of city_radius_miles and whose spread is drawn from
+    spread_miles; the type's shops are split between its clusters at random.
+
+    :param n: Total number of shops.
+    :param k_types: Number of shop types.
+    :param center: (latitude, longitude) of the city.
+    :param clusters: Clusters per shop type.
+    :param spread_miles: (min, max) standard deviation of a cluster, in miles.
+    :param city_radius_miles: Radius of the disc the cluster centers fall in.
+    :param type_names: Names for the types (default "type_0", "type_1", ...).
+    :param seed: Seed for reproducible output.
+    :return: DataFrame with osm_id, name, address, type, latitude and longitude columns.
+    """
+    rng = np.random.default_rng(seed)
+    type_names = list(type_names) if type_names is not None else [f"type_{i}" for i in range(k_types)]
+    if len(type_names) < k_types:
+        raise ValueError(f"Need {k_types} type names, got {len(type_names)}")
+
+    lat0, lon0 = center
+    miles_per_degree_lon = MILES_PER_DEGREE_LAT * np.cos(np.radians(lat0))
+
+    # Shops per type, then per cluster within each type.
+    per_type = rng.multinomial(n, np.full(k_types, 1 / k_types))
+    lats, lons, types = [], [], []
+    for shop_type, type_count in enumerate(per_type):
+        per_cluster = rng.multinomial(type_count, rng.dirichlet(np.ones(clusters)))
+        for cluster_count in per_cluster:
+            # Cluster centers are uniform over the city disc, spreads random.
+            r = city_radius_miles * np.sqrt(rng.random())
+            theta = rng.random() * 2 * np.pi
+            spread = rng.uniform(*spread_miles)
+            dy = r * np.sin(theta) + rng.normal(0, spread, cluster_count)
+            dx = r * np.cos(theta) + rng.normal(0, spread, cluster_count)
+            lats.append(lat0 + dy / MILES_PER_DEGREE_LAT)
+            lons.append(lon0 + dx / miles_per_degree_lon)
+            types.extend([type_names[shop_type]] * cluster_count)
+
+    ids = np.arange(n)
+    return pd.DataFrame({
+        "osm_id": [f"node/{i + 1}" for i in ids],
+        "name": [f"Shop {i + 1}" for i in ids],
+        "address": [f"{100 + i} Main St" for i in ids],
+        "type": types,
+        "latitude": np.concatenate(lats) if lats else np.empty(0),
+        "longitude": np.concatenate(lons) if lons else np.empty(0),
+    })
+
+
+def main():
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="Generate clustered synthetic shop data.")
+    parser.add_argument("-n", type=int, default=150, help="number of shops")
+    parser.add_argument("-k", "--types", type=int, default=3, help="number of shop types")
+    parser.add_argument("--clusters", type=int, default=2, help="clusters per shop type")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="shop_data.csv")
+    args = parser.parse_args()
+
+    data = generate_shops(args.n, args.types, clusters=args.clusters, seed=args.seed)
+    data.to_csv(args.out, index=False)
+
+    for shop_type, shops in data.groupby("type"):
+        plt.scatter(shops["longitude"], shops["latitude"], s=8, label=shop_type)
+    plt.legend()
+    plt.savefig(args.out.rsplit(".", 1)[0] + ".png")
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
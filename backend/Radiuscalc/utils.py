@@ -1,7 +1,17 @@
 import numpy as np
 import pandas as pd
 
+EARTH_RADIUS_MILES = 3958.7613  # same as frontend/utils/geo.py
+
 
 #  the Points P1 and P2 are latitude and longitude coordinates
 def distance(p1, p2):
-    return np.linalg.norm(p1 - p2)
+    """
+    Great-circle (haversine) distance in miles between two (lat, long) points.
+    Either coordinate may be an array, in which case they broadcast.
+    """
+    lat1, lon1 = np.radians(p1[0]), np.radians(p1[1])
+    lat2, lon2 = np.radians(p2[0]), np.radians(p2[1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    d = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return float(d) if np.ndim(d) == 0 else d
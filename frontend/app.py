@@ -1,28 +1,244 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, jsonify, session, g
+from flask import before_render_template, template_rendered
 from config import settings
-import googlemaps, time
+import atexit
+import hmac
+import json
+import math
+import threading
+import time
+import click
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_migrate import Migrate
-from utils.fetch_data import get_nearby_businesses
-from utils.radius_calc import find_radius
+from utils.osm import COLUMNS
+from utils.snapshots import SnapshotStore, decode_cursor, encode_cursor
+from utils.query_plans import check_statements, record_statements
+from utils.prefetch import PrefetchQueue
+from utils.response_cache import ResponseCache, make_etag
+from utils.db_tuning import make_read_engine, tune_engine
+from utils.metrics import REGISTRY, begin_request, end_request, instrument_engine, new_request_id, observe_stage, span
+from utils.geocoding import make_geocoder, normalize_address
+from utils.photo_store import PhotoStore
+from utils.passwords import PasswordHasher
+from utils.user_cache import UserCache
 import random
-import pandas as pd
+import csv
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key_here'  # Replace with a strong secret key.
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///user.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Extensions are bound to an app in create_app().
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 
-# Initialize the database and login manager.
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+# Routes, request hooks and CLI commands (registered at the top level, not under "main").
+bp = Blueprint("main", __name__, cli_group=None)
 
-# Initialize the Google Maps client.
-gmaps = googlemaps.Client(key=settings.google_maps_api_key)
+# Geocoding provider (Google Maps by default); clients are built on first use.
+geocoder = make_geocoder(settings)
+
+# Per-user snapshots of nearby businesses, so paging doesn't recompute them.
+snapshots = SnapshotStore(ttl=settings.snapshot_ttl)
+
+# Background workers that warm snapshots after login/registration.
+prefetcher = PrefetchQueue(workers=settings.prefetch_workers, max_queued=settings.prefetch_queue_size)
+atexit.register(prefetcher.shutdown, wait=True, timeout=10)
+
+# Transaction photos, deduplicated by content hash.
+photos = PhotoStore(settings.photo_store_path, max_bytes=settings.photo_max_bytes)
+
+# Rendered map/table responses per user, revalidated by ETag.
+responses = ResponseCache(max_users=settings.response_cache_users,
+                          min_compress_size=settings.response_compress_min_size)
+
+# Password hashing in its own processes, so a burst of logins can't take every core.
+passwords = PasswordHasher(workers=settings.password_hash_workers, method=settings.password_hash_method,
+                           salt_length=settings.password_salt_length)
+atexit.register(passwords.shutdown)
+
+# Recently loaded users, so Flask-Login doesn't SELECT the user on every request.
+user_cache = UserCache(max_users=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+# ----------------------------
+# Application Factory
+# ----------------------------
+def create_app(config=None, migrations=True):
+    """
+    Builds the Flask app. Nothing heavy happens here: the POI store, Overpass
+    client and tile cache (and numpy/pandas/requests behind them) are set up
+    by configure_services() on the first request that needs them.
+
+    :param config: Optional dict of Flask config overrides.
+    :param migrations: Register Flask-Migrate's `flask db` commands (and import
+                       Alembic); WSGI workers don't need them.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your_secret_key_here'  # Replace with a strong secret key.
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings.database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config or {})
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    if migrations:
+        from flask_migrate import Migrate
+        Migrate(app, db, render_as_batch=True)  # batch mode so SQLite can ALTER tables
+
+    app.register_blueprint(bp)
+    before_render_template.connect(start_render_timer, app)
+    template_rendered.connect(stop_render_timer, app)
+    with app.app_context():
+        if settings.sqlite_tuning:
+            tune_engine(db.engine, **sqlite_options())
+        instrument_engine(db.engine)
+        if settings.read_pool:
+            read_engine = make_read_engine(settings.database_read_url or db.engine.url,
+                                           pool_size=settings.read_pool_size, **sqlite_options())
+            instrument_engine(read_engine)
+            app.extensions["read_engine"] = read_engine
+    return app
+
+def sqlite_options():
+    """SQLite pragma settings for utils.db_tuning."""
+    return {"wal": settings.sqlite_wal, "synchronous": settings.sqlite_synchronous,
+            "busy_timeout_ms": settings.sqlite_busy_timeout_ms, "mmap_size": settings.sqlite_mmap_size,
+            "cache_size_kib": settings.sqlite_cache_size_kib}
+
+def read_session():
+    """
+    Session for read-only listing queries: on the read pool when READ_POOL is
+    set (closed at the end of the request), otherwise db.session.
+    """
+    engine = current_app.extensions.get("read_engine")
+    if engine is None:
+        return db.session
+    if "read_session" not in g:
+        g.read_session = Session(engine)
+    return g.read_session
+
+def __getattr__(name):
+    # `flask --app app ...` and `from app import app` still find a module-level
+    # app; it is only built when something asks for it.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ----------------------------
+# Nearby-Business Services
+# ----------------------------
+_services_lock = threading.Lock()
+_services_configured = False
+
+def configure_services():
+    """
+    Loads the offline POI store (if one has been imported) and sets up the
+    pooled Overpass client and the shared tile cache from settings. Runs once
+    per process, on first use, so a worker boots without them.
+    """
+    global _services_configured
+    if _services_configured:
+        return
+    with _services_lock:
+        if _services_configured:
+            return
+        from utils.poi_store import configure_poi_store
+        from utils.overpass_cache import configure_tile_cache
+        from utils.overpass_client import configure_overpass_client
+
+        configure_poi_store(settings.poi_store_path)
+        # Timeouts, retries and the cap on concurrent upstream requests.
+        configure_overpass_client(url=settings.overpass_url,
+                                  timeout=settings.overpass_timeout,
+                                  retries=settings.overpass_retries,
+                                  deadline=settings.overpass_deadline,
+                                  max_concurrent=settings.overpass_max_concurrent)
+        # Share Overpass results between users.
+        configure_tile_cache(path=settings.overpass_cache_path,
+                             ttl=settings.overpass_cache_ttl,
+                             max_entries=settings.overpass_cache_size,
+                             enabled=settings.overpass_cache_enabled)
+        _services_configured = True
+
+def tile_cache():
+    """The shared tile cache, or None if it is disabled or nothing has used it yet."""
+    if not _services_configured:
+        return None
+    from utils.overpass_cache import get_tile_cache
+    return get_tile_cache()
+
+# ----------------------------
+# Instrumentation
+# ----------------------------
+REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "Request latency by route.", ("route", "method", "status"))
+REQUEST_QUERIES = REGISTRY.histogram("http_request_db_queries", "SQL statements per request.", ("route",),
+                                     buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+BEST_RADIUS = REGISTRY.histogram("nearby_best_radius_miles", "Radius chosen by find_radius.",
+                                 buckets=(0.25, 0.5, 1, 1.5, 2, 3, 4, 5))
+SEARCH_ROUNDS = REGISTRY.histogram("nearby_search_rounds", "Rounds taken by the adaptive radius search.",
+                                   buckets=(1, 2, 3, 4, 5, 6, 8))
+GEOCODE_LOOKUPS = REGISTRY.counter("geocode_cache_lookups_total", "Geocode cache lookups.", ("result",))
+
+def _cache_hit_ratios():
+    ratios = {}
+    cache = tile_cache()
+    if cache is not None:
+        ratios["tile"] = cache.stats()["hit_rate"]
+    lookups = snapshots.hits + snapshots.misses
+    ratios["snapshot"] = snapshots.hits / lookups if lookups else 0.0
+    lookups = responses.hits + responses.misses
+    ratios["response"] = responses.hits / lookups if lookups else 0.0
+    lookups = user_cache.hits + user_cache.misses
+    ratios["user"] = user_cache.hits / lookups if lookups else 0.0
+    hits, misses = GEOCODE_LOOKUPS.value(result="hit"), GEOCODE_LOOKUPS.value(result="miss")
+    ratios["geocode"] = hits / (hits + misses) if hits + misses else 0.0
+    return ratios
+
+REGISTRY.gauge("cache_hit_ratio", "Hit ratio per cache since start.", _cache_hit_ratios, ("cache",))
+REGISTRY.gauge("tile_cache_entries", "Entries in the Overpass tile cache.",
+               lambda: tile_cache().stats()["entries"] if tile_cache() is not None else None)
+REGISTRY.gauge("snapshots_live", "Per-user snapshots held in memory.", lambda: len(snapshots))
+REGISTRY.gauge("prefetch_queue_depth", "Prefetch jobs waiting for a worker.", lambda: prefetcher.stats()["queue_depth"])
+
+@bp.before_app_request
+def start_request_metrics():
+    begin_request(new_request_id(request.headers.get("X-Request-ID")))
+
+@bp.after_app_request
+def finish_request_metrics(response):
+    stats = end_request()
+    if stats is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - stats.started,
+                            route=route, method=request.method, status=response.status_code)
+    REQUEST_QUERIES.observe(stats.queries, route=route)
+    response.headers["X-Request-ID"] = stats.id
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
+@bp.teardown_app_request
+def reset_request_metrics(exc):
+    end_request()  # in case after_request didn't run
+
+@bp.teardown_app_request
+def close_read_session(exc):
+    session = g.pop("read_session", None)
+    if session is not None:
+        session.close()
+
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+def stop_render_timer(sender, template, context, **extra):
+    started = g.pop("render_started", None)
+    if started is not None:
+        observe_stage("render", time.perf_counter() - started)
 
 # ----------------------------
 # Database Model for Users
@@ -36,39 +252,79 @@ class User(UserMixin, db.Model):
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
     cummulative_reward = db.Column(db.Float, default=0)
+    # Running star total, kept in step with cummulative_reward by add_counters().
+    star_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
     
     def calculate_rewards(self):
-        transactions = Transaction.query.filter_by(user_id=self.id).all()
-        total_rewards = sum([(transaction.trans_amount +3*max(0,transaction.trans_left_a_review) )for transaction in transactions])
-        self.cummulative_reward = total_rewards
+        """
+        Recomputes this user's reward and star counters from their full history,
+        in the current transaction (the caller commits).
+        """
+        reconcile_user_counters([self.id])
+        db.session.refresh(self)
+        return self.cummulative_reward
+
     @property
     def total_stars(self):
         """
-        Compute total stars from all transactions.
+        Total stars over all transactions, read from the maintained counter.
         Conditions for a transaction to award stars:
           - Star 1: if trans_amount is not 0 or -1.
           - Star 2: if trans_visited_here is True.
           - Star 3: if trans_left_a_review is not -1 or 0.
         """
-        transactions = Transaction.query.filter_by(user_id=self.id).all()
-        stars = 0
-        for t in transactions:
-            star1 = 1 if t.trans_amount not in [0, -1] else 0
-            star2 = 1 if t.trans_visited_here else 0
-            star3 = 1 if t.trans_left_a_review not in [-1, 0] else 0
-            stars += (star1 + star2 + star3)
-        return stars
+        return self.star_count or 0
         
 
+def user_columns(user):
+    return {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """
+    Runs on every authenticated request. A cached user is attached to the
+    session as already loaded (merge with load=False), so no SELECT is issued.
+    """
+    user_id = int(user_id)
+    row = user_cache.get(user_id)
+    if row is not None:
+        user = User(**row)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.put(user_id, user_columns(user))
+    return user
+
+def forget_user(user_id, session=None):
+    """
+    Drops a user's cached row now, and again once the current transaction
+    commits, so a request that reads the old row in between can't re-cache it.
+    """
+    user_id = int(user_id)  # add-transaction passes the form's string
+    user_cache.invalidate(user_id)
+    (session or db.session).info.setdefault("changed_users", set()).add(user_id)
+
+@event.listens_for(Session, "after_commit")
+def forget_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def discard_changed_users(session):
+    session.info.pop("changed_users", None)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def user_row_changed(mapper, connection, target):
+    """Profile edits made through the ORM (bulk counter UPDATEs call forget_user themselves)."""
+    forget_user(target.id, object_session(target))
 
 class Location(db.Model):
     __tablename__ = "location"
@@ -79,8 +335,68 @@ class Location(db.Model):
     address = db.Column(db.String(200))
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    # Coordinates rounded to ~10 m; with name, the natural key of a business.
+    lat_key = db.Column(db.Integer)
+    lng_key = db.Column(db.Integer)
     transactions = db.relationship('Transaction', backref='location', lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('name', 'lat_key', 'lng_key', name='uq_location_natural_key'),
+        # NULL keys never conflict in the constraint above, so businesses without
+        # coordinates are kept unique by name here.
+        db.Index('uq_location_name_no_coords', 'name', unique=True,
+                 sqlite_where=db.text('lat_key IS NULL'), postgresql_where=db.text('lat_key IS NULL')),
+    )
+
+def coordinate_key(value):
+    """
+    A coordinate rounded to 4 decimals (~10 m) as an integer, halves rounded up.
+    Migration 0002 backfills lat_key/lng_key with the same rule.
+    """
+    return math.floor(value * 10000 + 0.5)
+
+def location_key(latitude, longitude):
+    """Rounded (lat_key, lng_key) used to tell businesses with the same name apart."""
+    if latitude is None or longitude is None:
+        return None, None
+    return coordinate_key(latitude), coordinate_key(longitude)
+
+def upsert_locations(businesses, commit=True):
+    """
+    Inserts the businesses that aren't stored yet in one statement and one commit.
+    Rows that already exist (same name and rounded coordinates, or same name for
+    businesses without coordinates) are skipped, so repeated or concurrent calls
+    don't create duplicates.
+
+    :param commit: False leaves the commit to the caller.
+    """
+    rows = {}
+    for business in businesses:
+        lat_key, lng_key = location_key(business.get('latitude'), business.get('longitude'))
+        rows.setdefault((business['name'], lat_key, lng_key), {
+            "name": business['name'],
+            "address": business.get('address', ''),
+            "business_type": business.get('type', ''),
+            "latitude": business.get('latitude'),
+            "longitude": business.get('longitude'),
+            "lat_key": lat_key,
+            "lng_key": lng_key,
+        })
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    rows = list(rows.values())
+    # Multi-row VALUES, chunked to stay under the database's bound-parameter limit.
+    # No conflict target: a row is skipped on either unique index (with or without coordinates).
+    for start in range(0, len(rows), 500):
+        stmt = insert(Location).values(rows[start:start + 500]).on_conflict_do_nothing()
+        db.session.execute(stmt)
+    if commit:
+        db.session.commit()
+
 class Transaction(db.Model):
     __tablename__ = "transactions"
     id = db.Column(db.Integer, primary_key=True)
@@ -90,7 +406,190 @@ class Transaction(db.Model):
     trans_amount = db.Column(db.Float, nullable=False) # -1 = did not buy anything 
     trans_visited_here = db.Column(db.Boolean, nullable=False) # 1 or 0 for if they visited here
     trans_left_a_review = db.Column(db.Integer, nullable=False) # -1 = did not leave a review
+    photo_hash = db.Column(db.String(64))  # name of the photo in the photo store, if one was uploaded
+
+    __table_args__ = (
+        # Serves per-user history (user_id prefix) and per-user star lookups.
+        db.Index('ix_transactions_user_location', 'user_id', 'location_id'),
+        db.Index('ix_transactions_location_id', 'location_id'),
+    )
+
+
+# ----------------------------
+# Star Computation
+# ----------------------------
+def star_conditions():
+    """
+    Per-transaction star rules as SQL expressions (1 if met, else 0):
+      - Star 1: trans_amount is not 0 or -1 (bought something).
+      - Star 2: trans_visited_here is True.
+      - Star 3: trans_left_a_review is not -1 or 0.
+    """
+    return (
+        case((Transaction.trans_amount.notin_([0, -1]), 1), else_=0),
+        case((Transaction.trans_visited_here.is_(True), 1), else_=0),
+        case((Transaction.trans_left_a_review.notin_([-1, 0]), 1), else_=0),
+    )
+
+def transaction_reward(trans_amount, trans_left_a_review):
+    """Reward for one transaction: the amount plus 3 points per review star."""
+    return trans_amount + 3 * max(0, trans_left_a_review)
+
+def transaction_stars(trans_amount, trans_visited_here, trans_left_a_review):
+    """Stars for one transaction, same rules as star_conditions()."""
+    return ((1 if trans_amount not in [0, -1] else 0)
+            + (1 if trans_visited_here else 0)
+            + (1 if trans_left_a_review not in [-1, 0] else 0))
+
+def add_counters(user_id, reward, stars):
+    """
+    Adds to a user's reward and star counters with an in-place UPDATE, so it
+    lands in the caller's transaction and concurrent inserts don't lose counts.
+    """
+    db.session.query(User).filter(User.id == user_id).update({
+        User.cummulative_reward: func.coalesce(User.cummulative_reward, 0) + reward,
+        User.star_count: func.coalesce(User.star_count, 0) + stars,
+    }, synchronize_session=False)
+    forget_user(user_id)
+
+def reconcile_user_counters(user_ids=None):
+    """
+    Recomputes reward and star counters from the transactions table in one
+    UPDATE with correlated aggregates (all users, or just user_ids). Runs in the
+    caller's transaction; the caller commits.
+    """
+    star1, star2, star3 = star_conditions()
+    review_points = case((Transaction.trans_left_a_review > 0, Transaction.trans_left_a_review), else_=0)
+    reward = select(func.coalesce(func.sum(Transaction.trans_amount + 3 * review_points), 0)) \
+        .where(Transaction.user_id == User.id).scalar_subquery()
+    stars = select(func.coalesce(func.sum(star1 + star2 + star3), 0)) \
+        .where(Transaction.user_id == User.id).scalar_subquery()
+    stmt = update(User).values(cummulative_reward=reward, star_count=stars)
+    if user_ids is not None:
+        stmt = stmt.where(User.id.in_(user_ids))
+    result = db.session.execute(stmt, execution_options={"synchronize_session": False})
+    if user_ids is None:
+        user_cache.clear()
+    else:
+        for user_id in user_ids:
+            user_cache.invalidate(int(user_id))
+    return result.rowcount
+
+@bp.cli.command("reconcile-counters")
+def reconcile_counters_command():
+    """Backfill/repair every user's reward and star counters."""
+    count = reconcile_user_counters()
+    db.session.commit()
+    print(f"Reconciled counters for {count} users.")
+
+@bp.cli.command("check-query-plans")
+def check_query_plans_command():
+    """
+    Runs the request-path queries, EXPLAINs each one and exits non-zero if any
+    of them falls back to a full table scan.
+    """
+    with record_statements(db.engine) as statements:
+        load_user(1)
+        User.query.filter_by(username="").first()
+        cached_geocode("")
+        trim_geocode_cache()
+        upsert_locations([{"name": "", "latitude": 0.0, "longitude": 0.0}, {"name": ""}], commit=False)
+        location_ids_by_name([""])
+        stars_for_locations(1, [1])
+        latest_transaction_id(1)
+        location_by_name("")
+        add_counters(1, 0, 0)
+    db.session.rollback()
+
+    with db.engine.connect() as connection:
+        failures = check_statements(connection, statements)
+    for statement, plan, scanned in failures:
+        print(f"Full scan of {', '.join(scanned)}:\n  {statement}\n  " + "\n  ".join(plan))
+    print(f"Checked {len(statements)} statements, {len(failures)} with full table scans.")
+    if failures:
+        raise SystemExit(1)
+
+def location_ids_by_name(names, session=None):
+    """Maps each known business name to its Location id (the first one, like filter_by().first())."""
+    location_ids = {}
+    rows = (session or db.session).query(Location.name, Location.id) \
+        .filter(Location.name.in_(set(names))).order_by(Location.id)
+    for name, location_id in rows:
+        location_ids.setdefault(name, location_id)
+    return location_ids
+
+def location_by_name(name):
+    """The Location a transaction names (the first with that name, like location_ids_by_name), or None."""
+    return Location.query.filter_by(name=name).order_by(Location.id).first()
+
+def stars_for_locations(user_id, location_ids, session=None):
+    """
+    Stars (0-3) the user has earned at each location, in one aggregated query.
+    A location earns a star if any of the user's transactions there meets that rule.
+    """
+    star1, star2, star3 = star_conditions()
+    rows = (session or db.session).query(Transaction.location_id,
+                            func.max(star1) + func.max(star2) + func.max(star3)) \
+        .filter(Transaction.user_id == user_id, Transaction.location_id.in_(set(location_ids))) \
+        .group_by(Transaction.location_id).all()
+    stars = {location_id: 0 for location_id in location_ids}
+    stars.update((location_id, int(count)) for location_id, count in rows)
+    return stars
+
+class GeocodeCache(db.Model):
+    __tablename__ = "geocode_cache"
+    address_key = db.Column(db.String(255), primary_key=True)  # normalize_address()
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    provider = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# ----------------------------
+# Helper: Cached Geocoding
+# ----------------------------
+def cached_geocode(key):
+    """The GeocodeCache row for a normalized address, or None."""
+    return db.session.get(GeocodeCache, key)
+
+def trim_geocode_cache():
+    """Keeps the cache bounded: drops the oldest entries past the size limit."""
+    oldest = db.session.query(GeocodeCache.address_key) \
+        .order_by(GeocodeCache.created_at.desc()).offset(settings.geocode_cache_size)
+    db.session.query(GeocodeCache).filter(GeocodeCache.address_key.in_(oldest.scalar_subquery())) \
+        .delete(synchronize_session=False)
 
+def geocode_address(address):
+    """
+    (latitude, longitude) for an address, or None if it can't be found.
+    Results are cached by normalized address for GEOCODE_CACHE_TTL seconds;
+    only misses reach the geocoding provider.
+    """
+    key = normalize_address(address)[:255]
+    cached = cached_geocode(key)
+    if cached and (datetime.utcnow() - cached.created_at).total_seconds() < settings.geocode_cache_ttl:
+        GEOCODE_LOOKUPS.inc(result="hit")
+        return cached.latitude, cached.longitude
+
+    GEOCODE_LOOKUPS.inc(result="miss")
+    with span("geocode"):
+        result = geocoder.geocode(address)
+    if result is None:
+        return None
+
+    if cached is None:
+        cached = GeocodeCache(address_key=key)
+        db.session.add(cached)
+    cached.latitude, cached.longitude = result
+    cached.provider = geocoder.name
+    cached.created_at = datetime.utcnow()
+    trim_geocode_cache()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request cached the same address first.
+        db.session.rollback()
+    return result
 
 def load_users():
     return User.query.all()
@@ -101,6 +600,78 @@ def load_locations():
 def load_transactions():
     return Transaction.query.all()
 
+# ----------------------------
+# Batch Proximity (users <-> locations)
+# ----------------------------
+class UserNearbyLocation(db.Model):
+    """The k nearest locations of each user, rebuilt by `flask compute-proximity`."""
+    __tablename__ = "user_nearby_location"
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 1 = nearest
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False, index=True)
+    distance = db.Column(db.Float, nullable=False)  # miles
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+class LocationCoverage(db.Model):
+    """How many users live within radius_miles of each location, rebuilt with UserNearbyLocation."""
+    __tablename__ = "location_coverage"
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), primary_key=True)
+    radius_miles = db.Column(db.Float, nullable=False)
+    users_within = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+def compute_proximity(k=10, radius_miles=1.0, workers=None, chunk_size=100_000, write_batch=50_000):
+    """
+    Recomputes UserNearbyLocation and LocationCoverage for every user and
+    location with coordinates, replacing the previous results in one transaction.
+
+    :return: (users, locations) processed.
+    """
+    from utils.proximity import coverage_counts, nearest_shops
+    import numpy as np
+
+    users = db.session.execute(select(User.id, User.latitude, User.longitude)
+                               .where(User.latitude.isnot(None), User.longitude.isnot(None))).all()
+    locations = db.session.execute(select(Location.id, Location.latitude, Location.longitude)
+                                   .where(Location.latitude.isnot(None), Location.longitude.isnot(None))).all()
+    user_ids, user_lats, user_lons = (np.array(c) for c in zip(*users)) if users else ([], [], [])
+    location_ids, location_lats, location_lons = (np.array(c) for c in zip(*locations)) if locations else ([], [], [])
+
+    dists, idx = nearest_shops(user_lats, user_lons, location_lats, location_lons, k=k,
+                               chunk_size=chunk_size, workers=workers)
+    counts = coverage_counts(location_lats, location_lons, radius_miles, user_lats, user_lons, workers=workers)
+
+    now = datetime.utcnow()
+    db.session.execute(UserNearbyLocation.__table__.delete())
+    db.session.execute(LocationCoverage.__table__.delete())
+    # Row dicts are built a batch at a time; executemany does the inserts.
+    for start in range(0, len(user_ids), max(1, write_batch // max(k, 1))):
+        stop = start + max(1, write_batch // max(k, 1))
+        rows = [{"user_id": int(user_id), "rank": rank + 1, "location_id": int(location_ids[j]),
+                 "distance": float(d), "computed_at": now}
+                for user_id, row_d, row_i in zip(user_ids[start:stop], dists[start:stop], idx[start:stop])
+                for rank, (d, j) in enumerate(zip(row_d, row_i)) if j < len(location_ids)]
+        if rows:
+            db.session.execute(UserNearbyLocation.__table__.insert(), rows)
+    for start in range(0, len(location_ids), write_batch):
+        rows = [{"location_id": int(location_id), "radius_miles": radius_miles, "users_within": int(count),
+                 "computed_at": now}
+                for location_id, count in zip(location_ids[start:start + write_batch], counts[start:start + write_batch])]
+        db.session.execute(LocationCoverage.__table__.insert(), rows)
+    db.session.commit()
+    return len(user_ids), len(location_ids)
+
+@bp.cli.command("compute-proximity")
+@click.option("--k", default=10, show_default=True, help="Nearest locations to keep per user.")
+@click.option("--radius", default=1.0, show_default=True, help="Coverage radius per location, in miles.")
+@click.option("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+@click.option("--chunk-size", default=100_000, show_default=True, help="Users per nearest-k work item.")
+def compute_proximity_command(k, radius, workers, chunk_size):
+    """Rebuild the nearest-locations and location-coverage tables for all users."""
+    start = time.perf_counter()
+    users, locations = compute_proximity(k=k, radius_miles=radius, workers=workers, chunk_size=chunk_size)
+    print(f"Computed proximity for {users} users and {locations} locations in {time.perf_counter() - start:.1f}s.")
+
 # ----------------------------
 # User Registration Endpoint
 # ----------------------------
@@ -110,17 +681,17 @@ BRAND_CAPTCHAS = [
     {"name": "meta", "image": "https://upload.wikimedia.org/wikipedia/commons/7/7b/Meta_Platforms_Inc._logo.svg"}
 ]
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == "POST":
         # Check captcha response.
         captcha_response = request.form.get("captcha_response", "").strip().lower()
         if captcha_response != "solved":
             flash("Captcha not resolved. Please solve the captcha correctly.")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         username = request.form.get("username")
         password = request.form.get("password")
@@ -128,26 +699,19 @@ def register():
         
         if not username or not password or not home_address:
             flash("Please fill out all fields.")
-            return redirect(url_for('register'))
-        
-        # Geocode the provided home address.
-        geocode_result = gmaps.geocode(home_address)
-        if not geocode_result:
-            flash("Could not find the provided address. Please try a different address.")
-            return redirect(url_for('register'))
-        
-        location = geocode_result[0].get("geometry", {}).get("location", {})
-        try:
-            latitude = float(location.get("lat"))
-            longitude = float(location.get("lng"))
-        except (TypeError, ValueError):
-            flash("Error processing the provided address.")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         # Check if the username already exists.
         if User.query.filter_by(username=username).first():
             flash("Username already exists. Please choose a different one.")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
+        
+        # Geocode the provided home address (cached per address).
+        geocode_result = geocode_address(home_address)
+        if not geocode_result:
+            flash("Could not find the provided address. Please try a different address.")
+            return redirect(url_for('main.register'))
+        latitude, longitude = geocode_result
         
         # Create and store the new user.
         new_user = User(username=username,
@@ -158,10 +722,11 @@ def register():
         db.session.add(new_user)
         db.session.commit()
         
-        # Automatically log the new user in.
+        # Automatically log the new user in and start warming their listings.
         login_user(new_user)
+        prefetch_nearby(new_user)
         flash("Registration successful. You are now logged in.")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     return render_template("register.html", google_maps_api_key=settings.google_maps_api_key)
 
@@ -170,41 +735,46 @@ def register():
 # ----------------------------
 # User Login Endpoint
 # ----------------------------
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
         
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            if passwords.needs_rehash(user.password_hash):
+                # Hash method or parameters changed since this password was set.
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
-            return redirect(url_for('index'))
+            prefetch_nearby(user)
+            return redirect(url_for('main.index'))
         else:
             flash("Invalid username or password.")
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
     return render_template("login.html")
 
 # ----------------------------
 # User Logout Endpoint
 # ----------------------------
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # ----------------------------
 # Add Transaction Endpoint (Protected)
 # ----------------------------
-@app.route("/add-transaction", methods=["GET", "POST"])
+@bp.route("/add-transaction", methods=["GET", "POST"])
 @login_required
 def add_transaction():
     if request.method == "POST":
         # Get the form values.
-        location = Location.query.filter_by(name=request.form.get("businessName")).first()
+        location = location_by_name(request.form.get("businessName"))
         location_id = location.id if location else None
         user_id = request.form.get("user_id")
         
@@ -225,8 +795,17 @@ def add_transaction():
         else:
             trans_left_a_review = -1
 
-        # Process the photo upload (not stored in our Transaction model in this example).
+        # Stage the photo upload, if any (streamed to disk, deduplicated by content);
+        # it is stored once the transaction is committed.
         photo = request.files.get("photo")
+        photo_hash = None
+        staged_photos = []
+        if photo and photo.filename:
+            try:
+                photo_hash, _, tmp_path = photos.stage(photo.stream)
+                staged_photos.append((photo_hash, tmp_path))
+            except ValueError as e:
+                flash(f"Photo not saved: {e}")
         # Use the current time for the transaction.
         time_of_transaction = datetime.now()
 
@@ -237,34 +816,218 @@ def add_transaction():
             trans_time=time_of_transaction,
             trans_amount=trans_amount,
             trans_visited_here=trans_visited_here,
-            trans_left_a_review=trans_left_a_review
+            trans_left_a_review=trans_left_a_review,
+            photo_hash=photo_hash
         )
 
-        # Add the transaction to the session.
-        db.session.add(new_transaction)
-        
-        # Update the user’s cumulative reward.
-        user = User.query.get(user_id)
-        user.calculate_rewards()
-        
-        # Commit the changes.
-        db.session.commit()
+        with storing_photos(staged_photos):
+            # Add the transaction to the session.
+            db.session.add(new_transaction)
+
+            # Update the user’s reward and star counters in the same DB transaction.
+            add_counters(user_id,
+                         transaction_reward(trans_amount, trans_left_a_review),
+                         transaction_stars(trans_amount, trans_visited_here, trans_left_a_review))
+
+            # Commit the changes.
+            db.session.commit()
+        responses.invalidate(current_user.id)
         
         flash("Transaction submitted successfully!")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # For GET, redirect to the index (since the modal form is on index.html)
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
                                         
 
  
         
+# ----------------------------
+# Bulk Transaction Ingestion (partner kiosks)
+# ----------------------------
+JSONL_MIMETYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+def iter_jsonl(lines):
+    """Parses one JSON object per non-blank line (bytes or str)."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {number} is not valid JSON")
+
+def read_ingest_batch():
+    """
+    The records and photos of a /transactions/batch request. Accepts a JSON list
+    (or {"transactions": [...]}), JSON Lines streamed from the request body, or
+    multipart/form-data with a "transactions" file (JSON or JSON Lines) plus
+    photo files that records name in their "photo" field.
+
+    :return: (list of records, {field name: uploaded photo}).
+    :raises ValueError: If the body can't be parsed or holds too many records.
+    """
+    photos = {}
+    if request.mimetype in JSONL_MIMETYPES:
+        records = iter_jsonl(request.stream)
+    elif request.mimetype == "multipart/form-data":
+        upload = request.files.get("transactions")
+        if upload is None:
+            raise ValueError("Missing the transactions file")
+        photos = {name: f for name, f in request.files.items() if name != "transactions"}
+        head = upload.stream.read(1)
+        upload.stream.seek(0)
+        records = json.load(upload.stream) if head == b"[" else iter_jsonl(upload.stream)
+    else:
+        data = request.get_json(silent=True)
+        records = data.get("transactions") if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            raise ValueError("Expected a JSON list of transactions")
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) > settings.ingest_max_batch:
+            raise ValueError(f"More than {settings.ingest_max_batch} transactions in one batch")
+    return batch, photos
+
+def parse_ingest_record(record, uploads):
+    """
+    One batch record as Transaction column values (business_name still to be
+    resolved, and photo the name of its upload, saved only once the record is
+    accepted). Fields: user_id, business_name, and optionally time (ISO 8601),
+    amount, visited, review_rating and photo (the multipart field holding the photo).
+
+    :raises ValueError: If a field is missing or malformed.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Expected an object")
+    if not record.get("business_name"):
+        raise ValueError("Missing business_name")
+    trans_amount = float(record.get("amount", -1))
+    trans_left_a_review = int(record.get("review_rating", -1))
+    visited = record.get("visited", False)
+    if not isinstance(visited, bool):
+        raise ValueError("visited must be true or false")
+    time_of_transaction = datetime.fromisoformat(record["time"]) if record.get("time") else datetime.now()
+
+    user_id = int(record["user_id"])
+    photo = record.get("photo") or None
+    if photo is not None and photo not in uploads:
+        raise ValueError(f"No uploaded photo named {photo!r}")
+
+    return {
+        "user_id": user_id,
+        "business_name": str(record["business_name"]),
+        "trans_time": time_of_transaction,
+        "trans_amount": trans_amount,
+        "trans_visited_here": visited,
+        "trans_left_a_review": trans_left_a_review,
+        "photo": photo,
+    }
+
+@contextmanager
+def storing_photos(staged):
+    """
+    Publishes staged photos, as (digest, temporary path) pairs, if the block
+    (which commits the rows referring to them) succeeds, and drops them otherwise.
+    """
+    staged = list(staged)
+    try:
+        yield
+    except BaseException:
+        for _, tmp_path in staged:
+            photos.discard(tmp_path)
+        raise
+    for digest, tmp_path in staged:
+        photos.publish(digest, tmp_path)
+
+def ingest_transactions(records, uploads=None):
+    """
+    Inserts a batch of transactions in one database transaction: location names
+    are resolved in one query, the rows go in with one executemany INSERT and
+    each affected user's counters are updated once. Invalid records are skipped
+    and reported. Photos are stored only for records that pass every check, and
+    only once the batch is committed, so neither a rejected record nor a failed
+    commit leaves anything on disk.
+
+    :param records: Dicts as described in parse_ingest_record.
+    :param uploads: {field name: uploaded photo} for records with a photo.
+    :return: (number of transactions inserted, [{"index": i, "error": message}, ...]).
+    """
+    uploads = uploads or {}
+    parsed, errors = [], []
+    for index, record in enumerate(records):
+        try:
+            parsed.append((index, parse_ingest_record(record, uploads)))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({"index": index, "error": str(e) if not isinstance(e, KeyError) else f"Missing {e}"})
+
+    location_ids = location_ids_by_name(row["business_name"] for _, row in parsed)
+    user_ids = {row["user_id"] for _, row in parsed}
+    known_users = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+
+    rows = []
+    staged_photos = {}  # upload field -> (digest, temporary path); each upload is staged once
+    totals = defaultdict(lambda: [0.0, 0])  # user_id -> [reward, stars]
+    for index, row in parsed:
+        location_id = location_ids.get(row.pop("business_name"))
+        if location_id is None:
+            errors.append({"index": index, "error": "Unknown business"})
+            continue
+        if row["user_id"] not in known_users:
+            errors.append({"index": index, "error": "Unknown user"})
+            continue
+        photo = row.pop("photo")
+        row["photo_hash"] = None
+        if photo is not None:
+            if photo not in staged_photos:
+                try:
+                    digest, _, tmp_path = photos.stage(uploads[photo].stream)
+                    staged_photos[photo] = (digest, tmp_path)
+                except ValueError as e:
+                    staged_photos[photo] = e
+            if isinstance(staged_photos[photo], ValueError):
+                errors.append({"index": index, "error": str(staged_photos[photo])})
+                continue
+            row["photo_hash"] = staged_photos[photo][0]
+        row["location_id"] = location_id
+        rows.append(row)
+        total = totals[row["user_id"]]
+        total[0] += transaction_reward(row["trans_amount"], row["trans_left_a_review"])
+        total[1] += transaction_stars(row["trans_amount"], row["trans_visited_here"], row["trans_left_a_review"])
+
+    if rows:
+        with storing_photos(v for v in staged_photos.values() if not isinstance(v, ValueError)):
+            db.session.execute(Transaction.__table__.insert(), rows)
+            for user_id, (reward, stars) in totals.items():
+                add_counters(user_id, reward, stars)
+            db.session.commit()
+        for user_id in totals:
+            responses.invalidate(user_id)
+    errors.sort(key=lambda error: error["index"])
+    return len(rows), errors
+
+@bp.route("/transactions/batch", methods=["POST"])
+def ingest_batch():
+    # Kiosks authenticate with the shared ingest key; the endpoint is off without one.
+    key = request.headers.get("X-Ingest-Key", "")
+    if not settings.ingest_api_key or not hmac.compare_digest(key.encode(), settings.ingest_api_key.encode()):
+        return jsonify({"error": "Invalid ingest key"}), 403
+    try:
+        records, uploads = read_ingest_batch()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    inserted, errors = ingest_transactions(records, uploads)
+    return jsonify({"inserted": inserted, "errors": errors})
+
 # ----------------------------
 # Homepage (Protected)
 # ----------------------------
-@app.route("/")
+@bp.route("/")
 @login_required
 def index():
     return render_template("index.html",
@@ -274,25 +1037,94 @@ def index():
 # ----------------------------
 # Helper: Fetch Nearby Businesses
 # ----------------------------
+class NearbyUnavailable(Exception):
+    """Nearby businesses could not be fetched; nothing about the failed lookup is cached."""
+
+@bp.app_errorhandler(NearbyUnavailable)
+def nearby_unavailable(error):
+    response = jsonify({"error": "Nearby businesses are temporarily unavailable. Please try again."})
+    response.headers["Retry-After"] = "30"
+    return response, 503
+
 def fetch_businesses(lat: float, lng: float, required_count: int):
-    all_results = []
-    # Define a search radius (2 miles in meters)
+    """
+    The nearest businesses of each type around a point, as a NearbySet
+    (search details, if any, in its .meta).
+
+    :raises NearbyUnavailable: If Overpass failed, so callers never store an empty result.
+    """
+    from utils.fetch_data import nearby_records, search_nearby_adaptive, stream_nearby_records
+    from utils.overpass_client import OverpassError
+    from utils.poi_store import get_poi_store
+    from utils.radius_calc import stream_top_k
+    from utils.records import NearbySet
+
+    configure_services()
+    # Define a search radius (5 miles in meters)
     radius = int(5 * 1609.34)
-    response = get_nearby_businesses(lat, lng, radius=radius)
+    threshold, thresholds = settings.default_threshold, settings.type_thresholds
+    if settings.overpass_streaming and get_poi_store() is None:
+        # Parse Overpass incrementally and keep only the top-k per type.
+        with span("overpass_stream"):
+            try:
+                top = NearbySet.from_rows(stream_top_k(stream_nearby_records(lat, lng, radius=radius),
+                                                       threshold, thresholds))
+            except OverpassError as e:
+                raise NearbyUnavailable(str(e)) from e
+    else:
+        meta = {}
+        if settings.adaptive_search and get_poi_store() is None:
+            # Grow the radius in rings until every type has enough results.
+            nearby, searched, rounds = search_nearby_adaptive(lat, lng, threshold=threshold, thresholds=thresholds,
+                                                              max_radius=radius,
+                                                              start_radius=settings.adaptive_start_radius,
+                                                              growth=settings.adaptive_growth)
+            SEARCH_ROUNDS.observe(rounds)
+            meta = {"search_radius_miles": searched / 1609.34, "search_rounds": rounds}
+        else:
+            nearby = nearby_records(lat, lng, radius=radius)
+        if nearby is None:
+            raise NearbyUnavailable("Overpass lookup failed")
+        with span("find_radius"):
+            top = nearby.top_k(threshold, thresholds)
+        top.meta.update(meta)
+
+    # Best radius and cache stats are exported on /metrics.
+    if len(top):
+        BEST_RADIUS.observe(top.best_radius)
+
+    return top
+
+def snapshot_for(user_id, lat, lng):
+    """
+    The user's snapshot of nearby businesses, computed on first use and reused
+    until it expires or the user's coordinates change. A failed lookup raises
+    NearbyUnavailable and stores nothing, so the next request tries again.
+    """
+    def compute():
+        top = fetch_businesses(lat, lng, 1000)
+        return top.rows(), top.meta
+    return snapshots.get_or_create(user_id, (lat, lng), compute)
+
+def nearby_snapshot(user):
+    return snapshot_for(user.id, user.latitude, user.longitude)
+
+def prefetch_nearby(user):
+    """
+    Warms the user's snapshot in the background so the index page finds it
+    ready. If the lookup fails the job is marked failed and nothing is stored.
+    """
+    if user.latitude is None or user.longitude is None:
+        return False
+    if snapshots.peek(user.id, (user.latitude, user.longitude)) is not None:
+        return False
+    return prefetcher.submit(user.id, snapshot_for, user.id, user.latitude, user.longitude)
 
-    best_radius, counts , n_df= find_radius((lat, lng), response, threshold=17)
-    
-    print(f"Best radius: {best_radius}")
-    print(f"Counts within radius: {counts.sum()}")
-    # threshold the response with the best radius
-    
-    return n_df
 
-    
 # ----------------------------
 # Endpoint: Paginated Business Listings (Protected)
 # ----------------------------
-@app.route("/businesses", methods=["POST"])
+@bp.route("/businesses", methods=["POST"])
 @login_required
 def businesses():
     data = request.get_json()
@@ -306,48 +1138,43 @@ def businesses():
     if not user_id or int(user_id) != current_user.id:
         return jsonify({"error": "Invalid user id"}), 400
 
-    # Retrieve the current user's stored latitude and longitude.
-    lat = current_user.latitude
-    lng = current_user.longitude
-
     per_page = 5
-    required_count = page * per_page
 
-    # Fetch nearby businesses using the stored coordinates.
-    results = fetch_businesses(lat, lng, required_count)
+    # A cursor points into an existing snapshot; otherwise use (or build) the
+    # user's current one and start from the requested page. A cursor whose
+    # snapshot has expired gets 410, so the client restarts deliberately
+    # instead of being handed page 1 again.
+    if data.get("cursor"):
+        cursor = decode_cursor(data["cursor"])
+        if cursor is None:
+            return jsonify({"error": "Invalid cursor"}), 400
+        snapshot_id, start = cursor
+        snapshot = snapshots.get(snapshot_id, current_user.id)
+        if snapshot is None:
+            return jsonify({"error": "Cursor expired; request page 1 again.", "cursor_expired": True}), 410
+    else:
+        snapshot = nearby_snapshot(current_user)
+        start = (page - 1) * per_page
+
+    results = snapshot.rows
     total_results = len(results)
     total_pages = (total_results + per_page - 1) // per_page
-
-    start = (page - 1) * per_page
+    page = start // per_page + 1
     end = start + per_page
-    # (Optional) save dataframe for debugging
-    results.to_csv('df.csv')
-    
-    page_results = results[start:end].to_dict(orient='records')
-    print(f'page number: {page}')
+
+    page_results = results[start:end]
+    current_app.logger.debug('page number: %s', page)
+
+    # Look up the page's locations and the user's stars there in two queries (on the read pool, if any).
+    location_ids = location_ids_by_name((business['name'] for business in page_results), session=read_session())
+    stars_by_location = stars_for_locations(current_user.id, location_ids.values(), session=read_session())
 
     formatted = []
     for business in page_results:
-        # Default stars is 0/3 if no transaction is found.
-        stars = 0
-        # Try to find a Location record matching this business name.
-        location = Location.query.filter_by(name=business['name']).first()
-        if location:
-            # print(f'++++++++++++++++++{current_user.id}+++++++++++++++++++')
-            transactions = Transaction.query.filter_by(user_id=current_user.id,
-                                                       location_id=location.id).all()
-            
-            if transactions:
-                # Condition 1: at least one transaction with a valid trans_amount.
-                star1 = 1 if any(t.trans_amount not in [0, -1] for t in transactions) else 0
-                # Condition 2: at least one transaction where the user visited.
-                star2 = 1 if any(t.trans_visited_here for t in transactions) else 0
-                # Condition 3: at least one transaction with a valid review.
-                star3 = 1 if any(t.trans_left_a_review not in [-1, 0] for t in transactions) else 0
-                stars = star1 + star2 + star3
-
-        # Otherwise, stars remains 0.
-        
+        # Default stars is 0/3 if the business has no Location or transactions.
+        location_id = location_ids.get(business['name'])
+        stars = stars_by_location[location_id] if location_id else 0
+
         formatted.append({
             "name": business['name'],
             "address": business['address'],
@@ -362,81 +1189,80 @@ def businesses():
         "businesses": formatted,
         "current_page": page,
         "total_pages": total_pages,
-        "total_results": total_results
+        "total_results": total_results,
+        "next_cursor": encode_cursor(snapshot.id, end) if end < total_results else None,
+        "prev_cursor": encode_cursor(snapshot.id, max(0, start - per_page)) if start > 0 else None,
+        # Radius searched and rounds taken, when the adaptive search was used.
+        "search": snapshot.meta or None
     })
 
 
-@app.route("/businesses_table", methods=["GET"])
+def latest_transaction_id(user_id):
+    """Id of the user's newest transaction (0 if none); changes whenever their stars can."""
+    return db.session.query(func.max(Transaction.id)).filter(Transaction.user_id == user_id).scalar() or 0
+
+def nearby_etag(route, user, snapshot):
+    """ETag for a view of the user's nearby businesses: coordinates, snapshot and newest transaction."""
+    return make_etag(route, user.id, user.latitude, user.longitude, snapshot.id, latest_transaction_id(user.id))
+
+def cached_response(key, etag, render, mimetype):
+    """
+    Serves the current user's `key` response through the response cache: 304 if
+    the client already has etag, else the cached body (rendered by render() on a
+    miss), gzip/brotli-compressed when the client accepts it and it's large enough.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        entry = responses.get(current_user.id, key, etag)
+        if entry is None:
+            entry = responses.put(current_user.id, key, etag, render(), mimetype)
+        body, encoding = responses.body_for(entry, request.accept_encodings.best_match(responses.encodings))
+        response = Response(body, mimetype=entry.mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"  # always revalidate
+    response.vary.add("Accept-Encoding")
+    return response
+
+@bp.route("/businesses_table", methods=["GET"])
 @login_required
 def businesses_table():
-    # Retrieve the current user's stored latitude and longitude.
-    lat = current_user.latitude
-    lng = current_user.longitude
-    
-    # Set a required count (you can adjust this as needed).
-    required_count = 50
-    
-    # Fetch nearby businesses; note that fetch_businesses returns a DataFrame.
-    df = fetch_businesses(lat, lng, required_count)
-    df.to_csv('df.csv')
-    # Optionally, you can sort or filter the DataFrame here.
-    # For example: df = df.sort_values('distance')
-    
-    # Convert the DataFrame to an HTML table.
-    # You can pass CSS classes to style it (here we use Bootstrap classes).
-    table_html = df.to_html(classes="table table-striped", index=False)
-    
-    # Render the table in a template.
-    return render_template("businesses_table.html", table_html=table_html)
+    # Fetch nearby businesses from the user's snapshot.
+    snapshot = nearby_snapshot(current_user)
 
-@app.route("/businesses_all", methods=["POST"])
-@login_required
-def businesses_all():
-    data = request.get_json()
-    user_id = data.get("user_id")
-    if not user_id or int(user_id) != current_user.id:
-        return jsonify({"error": "Invalid user id"}), 400
+    def render():
+        rows = snapshot.rows
+        with open('df.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        # Render the rows as a table directly in the template (Bootstrap classes for styling).
+        return render_template("businesses_table.html", columns=COLUMNS, rows=rows)
+
+    return cached_response("businesses_table", nearby_etag("businesses_table", current_user, snapshot), render,
+                           "text/html")
 
-    # Get the user's latitude and longitude.
-    lat = current_user.latitude
-    lng = current_user.longitude
+def nearby_listing(user, snapshot):
+    """The snapshot's businesses with the user's star string, storing any missing Locations."""
+    results = snapshot.rows
+    location_ids = location_ids_by_name(business['name'] for business in results)
 
-    # Set required_count to a high number to get all nearby businesses.
-    required_count = 1000  
-    # fetch_businesses returns a DataFrame of results.
-    results = fetch_businesses(lat, lng, required_count)
+    # Store the businesses that aren't in the database yet, all at once.
+    missing = [business for business in results if business['name'] not in location_ids]
+    if missing:
+        upsert_locations(missing)
+        location_ids.update(location_ids_by_name(business['name'] for business in missing))
+
+    # Stars for every listed location in one query.
+    stars_by_location = stars_for_locations(user.id, location_ids.values())
 
     formatted = []
-    for business in results.to_dict(orient='records'):
-        # Default star rating is 0.
-        stars = 0
-
-        # Try to find a matching Location record using the business name.
-        location = Location.query.filter_by(name=business['name']).first()
-
-        # If the location is not in the database, create and upload it.
-        if not location:
-            location = Location(
-                name=business['name'],
-                address=business.get('address', ''),
-                business_type=business.get('type', ''),
-                latitude=business.get('latitude'),
-                longitude=business.get('longitude')
-            )
-            db.session.add(location)
-            db.session.commit()  # Commit so that location gets an ID.
-
-        # Now, query for any transactions by the current user at this location.
-        transactions = Transaction.query.filter_by(user_id=current_user.id,
-                                                   location_id=location.id).all()
-        if transactions:
-            # Condition 1: At least one transaction with trans_amount not in [0, -1].
-            star1 = 1 if any(t.trans_amount not in [0, -1] for t in transactions) else 0
-            # Condition 2: At least one transaction where trans_visited_here is True.
-            star2 = 1 if any(t.trans_visited_here for t in transactions) else 0
-            # Condition 3: At least one transaction with trans_left_a_review not in [-1, 0].
-            star3 = 1 if any(t.trans_left_a_review not in [-1, 0] for t in transactions) else 0
-            stars = star1 + star2 + star3
+    for business in results:
+        location_id = location_ids.get(business['name'])
+        stars = stars_by_location[location_id] if location_id else 0
 
         # Build the star string using Unicode characters:
         filled_star = "★"  # U+2605
@@ -451,10 +1277,76 @@ def businesses_all():
             "type": business['type'],
             "stars": star_string
         })
-        
-    return jsonify({"businesses": formatted})
+    return formatted
+
+def parse_viewport(data):
+    """
+    (zoom, bbox) from a /businesses_all request, or (None, None) without a zoom.
+
+    :raises ValueError: If zoom isn't a number or bbox isn't [south, west, north, east].
+    """
+    if data.get("zoom") is None:
+        return None, None
+    zoom = int(data["zoom"])
+    bbox = data.get("bbox")
+    if bbox is not None:
+        bbox = tuple(float(v) for v in bbox)
+        if len(bbox) != 4 or bbox[0] > bbox[2]:
+            raise ValueError("bbox must be [south, west, north, east]")
+    return zoom, bbox
+
+@bp.route("/businesses_all", methods=["POST"])
+@login_required
+def businesses_all():
+    data = request.get_json()
+    user_id = data.get("user_id")
+    if not user_id or int(user_id) != current_user.id:
+        return jsonify({"error": "Invalid user id"}), 400
+    try:
+        zoom, bbox = parse_viewport(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid zoom or bbox"}), 400
+
+    # All nearby businesses, from the user's snapshot.
+    snapshot = nearby_snapshot(current_user)
+    etag = nearby_etag("businesses_all", current_user, snapshot)
+    if zoom is None:
+        return cached_response("businesses_all", etag,
+                               lambda: current_app.json.dumps({"businesses": nearby_listing(current_user, snapshot)})
+                               + "\n",
+                               "application/json")
+
+    # Clustering mode: markers grouped per zoom level, only those in the viewport.
+    def render():
+        from utils.clustering import ClusterIndex
+        index = responses.memo(current_user.id, "cluster_index", etag,
+                               lambda: ClusterIndex(nearby_listing(current_user, snapshot)))
+        clusters, singles = index.query(zoom, bbox)
+        return current_app.json.dumps({"zoom": zoom, "clusters": clusters, "businesses": singles}) + "\n"
+
+    return cached_response("businesses_all_clusters", make_etag(etag, zoom, bbox), render, "application/json")
+
+@bp.route("/prefetch_status", methods=["GET"])
+@login_required
+def prefetch_status():
+    return jsonify({
+        "job": prefetcher.status(current_user.id),
+        "queue": prefetcher.stats()
+    })
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text exposition format.
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/cache_stats", methods=["GET"])
+@login_required
+def cache_stats():
+    configure_services()
+    cache = tile_cache()
+    return jsonify(cache.stats() if cache is not None else {})
 
-@app.route("/rewards")
+@bp.route("/rewards")
 @login_required
 def rewards():
     # Example reward items with image URLs.
@@ -495,9 +1387,9 @@ def rewards():
 
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         print('-------------------')
-        migrate = Migrate(app, db)
         print(db.create_all())
 
     app.run(debug=True)
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark for building the nearby-businesses DataFrame.
+
+Compares the old per-element pd.concat + geodesic loop against
+records_to_frame (one pass + vectorized haversine, and its exact mode).
+
+Run from frontend/:  python -m benchmarks.bench_fetch_parse
+"""
+import random
+import time
+
+import pandas as pd
+from geopy.distance import geodesic
+
+from utils.fetch_data import records_to_frame
+from utils.osm import BUSINESS_TYPES, COLUMNS
+
+LATITUDE, LONGITUDE = 44.9778, -93.2650
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "osm_id": f"node/{i}",
+        "name": f"Business {i}",
+        "address": f"{i} Main St",
+        "type": rng.choice(BUSINESS_TYPES),
+        "latitude": LATITUDE + rng.uniform(-0.07, 0.07),
+        "longitude": LONGITUDE + rng.uniform(-0.1, 0.1),
+    } for i in range(n)]
+
+
+def legacy_frame(records, latitude, longitude):
+    businesses = pd.DataFrame(columns=COLUMNS)
+    for r in records:
+        dist = geodesic((latitude, longitude), (r["latitude"], r["longitude"])).miles
+        row = pd.DataFrame([[r["name"], r["address"], r["type"], r["latitude"], r["longitude"], dist]], columns=COLUMNS)
+        businesses = pd.concat([businesses, row], ignore_index=True)
+    return businesses.sort_values(by="distance").reset_index(drop=True)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print(f"{'n':>6} {'legacy (s)':>11} {'exact (s)':>10} {'fast (s)':>10} {'speedup':>8}")
+    for n in (100, 1_000, 10_000):
+        records = make_records(n)
+        legacy = best_of(lambda: legacy_frame(records, LATITUDE, LONGITUDE), 1 if n > 1_000 else 3)
+        exact = best_of(lambda: records_to_frame(records, LATITUDE, LONGITUDE, exact=True), 3)
+        fast = best_of(lambda: records_to_frame(records, LATITUDE, LONGITUDE), 5)
+        print(f"{n:>6} {legacy:>11.4f} {exact:>10.4f} {fast:>10.4f} {legacy / fast:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
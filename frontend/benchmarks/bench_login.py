@@ -0,0 +1,154 @@
+"""
+Login throughput, and listing latency while logins are happening.
+
+Runs one app per configuration, each in a fresh process. Listing threads,
+each logged in as its own user, keep requesting /businesses. For the first
+phase they run alone. In the second phase, login threads also post /login
+as fast as they can, each attempt from a new client. Each configuration
+starts from a fresh copy of the same database. The configurations compare
+hashing on the request threads with no user cache against the hashing
+process pool plus the user cache:
+
+    python -m benchmarks.bench_login --readers 2 --login-threads 4 --seconds 8
+
+Run from frontend/. Businesses come from a local POI store built from
+generate_data.py, so nothing touches the network.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.load_test import prepare
+
+
+def modes(hash_workers):
+    return {
+        "inline, no user cache": {"PASSWORD_HASH_WORKERS": "0", "USER_CACHE_SIZE": "0"},
+        f"pool({hash_workers}) + user cache": {"PASSWORD_HASH_WORKERS": str(hash_workers),
+                                               "USER_CACHE_SIZE": "4096"},
+    }
+
+
+def percentile(times, q):
+    return float(np.percentile(times, q) * 1000) if len(times) else float("nan")
+
+
+def run_app(readers, login_threads, seconds, results):
+    """One app process: times listings alone, then again with logins running."""
+    from app import create_app, passwords, User, db
+
+    sys.stdout = open(os.devnull, "w")  # the routes print as they go
+    app = create_app(migrations=False)
+    app.logger.disabled = True
+    clients = []
+    with app.app_context():
+        user_ids = {user.username: user.id for user in User.query.all()}
+    for i in range(readers):
+        client = app.test_client()
+        client.post("/login", data={"username": f"load{i}", "password": "load"})
+        client.post("/businesses", json={"user_id": user_ids[f"load{i}"], "page": 1})  # build the snapshot
+        clients.append((client, user_ids[f"load{i}"]))
+
+    def read(client, user_id, stop, timings):
+        page = 0
+        while not stop.is_set():
+            page = page % 5 + 1
+            began = time.perf_counter()
+            if client.post("/businesses", json={"user_id": user_id, "page": page}).status_code == 200:
+                timings.append(time.perf_counter() - began)
+
+    def log_in(stop, counts):
+        while not stop.is_set():
+            response = app.test_client().post("/login", data={"username": f"load{readers}", "password": "load"})
+            counts.append(response.status_code == 302 and response.headers["Location"] == "/")
+
+    phases = {}
+    for phase, logging_in in (("idle", 0), ("logins", login_threads)):
+        stop, reads, logins = threading.Event(), [], []
+        threads = [threading.Thread(target=read, args=(client, user_id, stop, reads)) for client, user_id in clients]
+        threads += [threading.Thread(target=log_in, args=(stop, logins)) for _ in range(logging_in)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        phases[phase] = {
+            "listings_per_s": len(reads) / seconds,
+            "listing_p50_ms": percentile(reads, 50),
+            "listing_p95_ms": percentile(reads, 95),
+            "logins_per_s": sum(logins) / seconds,
+            "failed_logins": logins.count(False),
+        }
+    with app.app_context():
+        db.engine.dispose()
+    passwords.shutdown()  # atexit never runs in a multiprocessing child, and its exit waits on the pool
+    results.put(phases)
+
+
+def run_mode(name, env, template, workdir, args):
+    db_path = os.path.join(workdir, "".join(c if c.isalnum() else "_" for c in name) + ".db")
+    shutil.copy(template, db_path)
+    os.environ.update(env)
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+
+    ctx = mp.get_context("spawn")  # a fresh interpreter reads the settings above
+    results = ctx.Queue()
+    proc = ctx.Process(target=run_app, args=(args.readers, args.login_threads, args.seconds, results))
+    proc.start()
+    phases = results.get()
+    proc.join()
+    return phases
+
+
+def report(results):
+    print(f"{'configuration':<26} {'phase':<7} {'logins/s':>9} {'listings/s':>11} {'listing p50':>12} "
+          f"{'listing p95':>12}")
+    for name, phases in results.items():
+        for phase, r in phases.items():
+            print(f"{name:<26} {phase:<7} {r['logins_per_s']:>9.1f} {r['listings_per_s']:>11.1f} "
+                  f"{r['listing_p50_ms']:>10.1f}ms {r['listing_p95_ms']:>10.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--readers", type=int, default=2, help="threads requesting listings")
+    parser.add_argument("--login-threads", type=int, default=4, help="threads posting /login")
+    parser.add_argument("--hash-workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="hashing processes in the pooled configuration")
+    parser.add_argument("--seconds", type=float, default=8.0, help="length of each phase")
+    parser.add_argument("--shops", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="benchlogin-")
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIzaLoadTestStandinKey")
+    os.environ.update({"POI_STORE_PATH": os.path.join(workdir, "pois.json"), "PREFETCH_WORKERS": "1",
+                       "PHOTO_STORE_PATH": os.path.join(workdir, "photos"), "PASSWORD_HASH_WORKERS": "0"})
+    os.environ.pop("DATABASE_READ_URL", None)
+    try:
+        template = prepare(workdir, args.shops, args.readers + 1, args.seed)
+        os.environ["SQLITE_TUNING"] = "true"
+        results = {name: run_mode(name, env, template, workdir, args)
+                   for name, env in modes(args.hash_workers).items()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote {os.path.abspath(args.out)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
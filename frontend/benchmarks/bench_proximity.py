@@ -0,0 +1,47 @@
+"""
+Benchmark for the batch proximity job (utils/proximity.py) on synthetic points.
+
+Times nearest-k for every user and within-radius counts for every shop,
+without the database writes.
+
+Run from frontend/:  python -m benchmarks.bench_proximity --users 1000000 --shops 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.proximity import coverage_counts, nearest_shops
+
+LATITUDE, LONGITUDE = 44.9778, -93.2650
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--shops", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius", type=float, default=1.0, help="coverage radius in miles")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    user_lats, user_lons = LATITUDE + rng.normal(0, 0.1, args.users), LONGITUDE + rng.normal(0, 0.15, args.users)
+    shop_lats, shop_lons = LATITUDE + rng.normal(0, 0.1, args.shops), LONGITUDE + rng.normal(0, 0.15, args.shops)
+
+    start = time.perf_counter()
+    nearest_shops(user_lats, user_lons, shop_lats, shop_lons, k=args.k, workers=args.workers)
+    nearest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    counts = coverage_counts(shop_lats, shop_lons, args.radius, user_lats, user_lons, workers=args.workers)
+    coverage = time.perf_counter() - start
+
+    print(f"{args.users} users x {args.shops} shops")
+    print(f"nearest-{args.k}: {nearest:.1f}s ({args.users / nearest:,.0f} users/s)")
+    print(f"coverage ({args.radius} mi): {coverage:.1f}s, mean {counts.mean():.0f} users per shop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+End-to-end benchmark suite on synthetic data.
+
+Generates clustered shops with backend/Radiuscalc/generate_data.py, serves them
+from local Overpass and Google Geocoding stand-ins, and times
+get_nearby_businesses, find_radius, the pandas-free NearbySet path,
+fetch_businesses and the /businesses* endpoints (through Flask's test
+client, including ETag revalidation) for a set of synthetic users.
+Reports p50/p95 latency and throughput and writes the results as JSON, so
+runs from two commits can be compared:
+
+    python -m benchmarks.bench_suite --out before.json
+    python -m benchmarks.bench_suite --out after.json --compare before.json
+
+Run from frontend/. Nothing touches the network or the real database.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.osm import BUSINESS_TYPES
+from utils.standins import GeocodingStandin, OverpassStandin
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GENERATOR = os.path.join(ROOT, "backend", "Radiuscalc", "generate_data.py")
+
+
+def load_generator():
+    # Loaded by path: backend/Radiuscalc has its own utils module that would
+    # shadow frontend's utils package if it were put on sys.path.
+    spec = importlib.util.spec_from_file_location("generate_data", GENERATOR)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def summarize(times):
+    times = np.asarray(times)
+    return {
+        "n": int(times.size),
+        "p50_ms": float(np.percentile(times, 50) * 1000),
+        "p95_ms": float(np.percentile(times, 95) * 1000),
+        "mean_ms": float(times.mean() * 1000),
+        "throughput_per_s": float(times.size / times.sum()) if times.sum() else float("inf"),
+    }
+
+
+def timed(fn, args_list, warmup=1):
+    """Times fn(*args) for each args tuple, after `warmup` untimed calls."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    generator = load_generator()
+    shops = generator.generate_shops(args.shops, len(BUSINESS_TYPES), center=generator.DEFAULT_CENTER,
+                                     clusters=args.clusters, type_names=BUSINESS_TYPES, seed=args.seed)
+    records = shops.to_dict(orient="records")
+
+    rng = random.Random(args.seed)
+    lat0, lon0 = generator.DEFAULT_CENTER
+    users = [(f"user{i}", f"{i} Bench Ave", (lat0 + rng.uniform(-0.05, 0.05), lon0 + rng.uniform(-0.07, 0.07)))
+             for i in range(args.users)]
+    points = [coords for _, _, coords in users]
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    overpass = OverpassStandin(records, delay=args.overpass_delay).start()
+    geocoding = GeocodingStandin({address: coords for _, address, coords in users}).start()
+
+    # The app reads its settings at import time.
+    os.environ.update({
+        "GOOGLE_MAPS_API_KEY": os.environ.get("GOOGLE_MAPS_API_KEY", "AIzaBenchmarkStandinKey"),
+        "GOOGLE_MAPS_BASE_URL": geocoding.url,
+        "GEOCODER": "google",
+        "OVERPASS_URL": overpass.url,
+        "DATABASE_URL": "sqlite:///" + os.path.join(workdir, "bench.db"),
+        "PREFETCH_WORKERS": "1",
+    })
+    os.environ.pop("POI_STORE_PATH", None)
+    os.environ.pop("OVERPASS_CACHE_PATH", None)
+
+    import app as webapp
+    flask_app = webapp.create_app()
+    webapp.configure_services()  # before the stand-in caches below replace its defaults
+    from utils.fetch_data import get_nearby_businesses, nearby_records
+    from utils.overpass_cache import configure_tile_cache, get_tile_cache
+    from utils.poi_store import POIStore
+    from utils.radius_calc import find_radius
+
+    os.chdir(workdir)  # /businesses_table writes df.csv to the working directory
+    radius = int(5 * 1609.34)
+    results = {}
+
+    try:
+        # Library calls.
+        configure_tile_cache(enabled=False)
+        results["get_nearby_businesses[overpass]"] = timed(
+            lambda lat, lon: get_nearby_businesses(lat, lon, radius=radius), points)
+
+        configure_tile_cache()
+        for lat, lon in points:
+            get_nearby_businesses(lat, lon, radius=radius)
+        results["get_nearby_businesses[tile cache warm]"] = timed(
+            lambda lat, lon: get_nearby_businesses(lat, lon, radius=radius), points)
+
+        store = POIStore(records)
+        results["get_nearby_businesses[poi store]"] = timed(
+            lambda lat, lon: get_nearby_businesses(lat, lon, radius=radius, store=store), points)
+
+        frames = [((lat, lon), get_nearby_businesses(lat, lon, radius=radius, store=store)) for lat, lon in points]
+        results["find_radius"] = timed(lambda point, df: find_radius(point, df, threshold=17), frames)
+
+        results["nearby_records[poi store]"] = timed(
+            lambda lat, lon: nearby_records(lat, lon, radius=radius, store=store), points)
+        sets = [(nearby_records(lat, lon, radius=radius, store=store),) for lat, lon in points]
+        results["NearbySet.top_k+rows"] = timed(lambda nearby: nearby.top_k(17).rows(), sets)
+
+        results["fetch_businesses[tile cache warm]"] = timed(
+            lambda lat, lon: webapp.fetch_businesses(lat, lon, 1000), points)
+        results["cache_stats"] = get_tile_cache().stats()
+
+        # Endpoints, one logged-in client per user.
+        with flask_app.app_context():
+            webapp.db.create_all()
+        clients = []
+        for username, address, _ in users:
+            client = flask_app.test_client()
+            client.post("/register", data={"username": username, "password": "bench", "home_address": address,
+                                           "captcha_response": "solved"})
+            clients.append(client)
+        webapp.prefetcher.shutdown(wait=True)
+        with flask_app.app_context():
+            user_ids = [webapp.User.query.filter_by(username=u).first().id for u, _, _ in users]
+        logged_in = list(zip(clients, user_ids))
+
+        def cold_page(client, user_id):
+            webapp.snapshots.invalidate(user_id)
+            client.post("/businesses", json={"user_id": user_id, "page": 1})
+
+        results["/businesses[cold snapshot]"] = timed(cold_page, logged_in)
+        results["/businesses[page 2]"] = timed(
+            lambda client, user_id: client.post("/businesses", json={"user_id": user_id, "page": 2}), logged_in)
+        results["/businesses_table"] = timed(lambda client, user_id: client.get("/businesses_table"), logged_in)
+        results["/businesses_all"] = timed(
+            lambda client, user_id: client.post("/businesses_all", json={"user_id": user_id}), logged_in)
+        etags = [(client, user_id, client.post("/businesses_all", json={"user_id": user_id}).headers["ETag"])
+                 for client, user_id in logged_in]
+        results["/businesses_all[304]"] = timed(
+            lambda client, user_id, etag: client.post("/businesses_all", json={"user_id": user_id},
+                                                      headers={"If-None-Match": etag}), etags)
+
+        # Clustered map view: pan a viewport around each user at two zoom levels.
+        viewports = [(client, user_id, {"zoom": zoom, "bbox": [lat - 0.02 + dy, lon - 0.04 + dx,
+                                                               lat + 0.02 + dy, lon + 0.04 + dx]})
+                     for (client, user_id), (lat, lon) in zip(logged_in, points)
+                     for zoom in (12, 15) for dx, dy in ((0, 0), (0.01, 0), (0, 0.01))]
+        results["/businesses_all[clusters]"] = timed(
+            lambda client, user_id, viewport: client.post("/businesses_all", json={"user_id": user_id, **viewport}),
+            viewports)
+    finally:
+        overpass.stop()
+        geocoding.stop()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "shops": args.shops,
+            "clusters": args.clusters,
+            "users": args.users,
+            "seed": args.seed,
+            "overpass_delay": args.overpass_delay,
+            "overpass_requests": overpass.requests,
+            "geocoding_requests": geocoding.requests,
+        },
+        "results": results,
+    }
+
+
+def report(data, baseline=None):
+    base = (baseline or {}).get("results", {})
+    print(f"{'benchmark':<40} {'p50 ms':>9} {'p95 ms':>9} {'ops/s':>9}" + (f" {'p50 vs base':>12}" if base else ""))
+    for name, r in data["results"].items():
+        if "p50_ms" not in r:
+            continue
+        line = f"{name:<40} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['throughput_per_s']:>9.1f}"
+        if name in base:
+            line += f" {r['p50_ms'] / base[name]['p50_ms']:>11.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--shops", type=int, default=2000)
+    parser.add_argument("--clusters", type=int, default=3)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overpass-delay", type=float, default=0.0, help="simulated Overpass latency (s)")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    out = os.path.abspath(args.out)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    data = run(args)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    report(data, baseline)
+    print(f"Wrote {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
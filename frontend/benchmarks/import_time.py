@@ -0,0 +1,116 @@
+"""
+Import-time report for worker start-up.
+
+Runs `python -X importtime -c "import wsgi"` (what a gunicorn worker does) in
+a fresh interpreter, then prints the total, the slowest imports by
+cumulative time and the self time per top-level package. With --check it
+exits non-zero if a module that should load lazily (pandas, numpy, scipy,
+geopy, googlemaps, requests, alembic) shows up, or if the total is over budget:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --check --budget-ms 800
+
+Run from frontend/.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+FRONTEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a request asks for nearby businesses, a geocode or a migration.
+LAZY_MODULES = ("pandas", "numpy", "scipy", "geopy", "googlemaps", "requests", "alembic")
+
+
+def parse_importtime(stderr):
+    """
+    Parses -X importtime output.
+
+    :return: List of (module, depth, self_us, cumulative_us) in the order printed
+             (children before their parent).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries
+
+
+def measure(statement, repeat=3):
+    """Imports statement in `repeat` fresh interpreters and returns the fastest run's entries."""
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_MAPS_API_KEY", "AIzaImportTimeReport")  # settings require a key
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=FRONTEND, env=env,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"`{statement}` failed:\n{proc.stderr[-2000:]}")
+        entries = parse_importtime(proc.stderr)
+        if best is None or total_us(entries) < total_us(best):
+            best = entries
+    return best
+
+
+def total_us(entries):
+    return sum(cumulative for _, depth, _, cumulative in entries if depth == 0)
+
+
+def by_package(entries):
+    """Self time per top-level package, slowest first."""
+    totals = defaultdict(int)
+    for module, _, self_us, _ in entries:
+        totals[module.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def report(entries, top=15):
+    print(f"Total import time: {total_us(entries) / 1000:.1f} ms ({len(entries)} modules)\n")
+    print(f"{'slowest imports (cumulative)':<50} {'ms':>8}")
+    for module, depth, _, cumulative in sorted(entries, key=lambda e: e[3], reverse=True)[:top]:
+        print(f"{'  ' * depth + module:<50} {cumulative / 1000:>8.1f}")
+    print(f"\n{'self time by package':<50} {'ms':>8}")
+    for package, self_us in by_package(entries)[:top]:
+        print(f"{package:<50} {self_us / 1000:>8.1f}")
+
+
+def check(entries, budget_ms=None):
+    """Problems found, as printable strings."""
+    loaded = {module for module, _, _, _ in entries}
+    problems = [f"{name} is imported at start-up" for name in LAZY_MODULES if name in loaded]
+    total_ms = total_us(entries) / 1000
+    if budget_ms is not None and total_ms > budget_ms:
+        problems.append(f"total import time {total_ms:.1f} ms is over the {budget_ms:.0f} ms budget")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--statement", default="import wsgi", help="what to import (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the fastest of")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a lazy module loads or the budget is exceeded")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    entries = measure(args.statement, args.repeat)
+    report(entries, args.top)
+    if args.check:
+        problems = check(entries, args.budget_ms)
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            raise SystemExit(1)
+        print("\nOK: no lazy modules imported at start-up.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Multi-process load test for the SQLite tuning in utils/db_tuning.py.
+
+Starts N worker processes, each with its own app (as gunicorn workers would
+have) on one shared SQLite file, and has every worker log in as its own user
+and hammer the app for a fixed time. Each request is either an
+/add-transaction write or a /businesses listing read. The same run is
+repeated with SQLite's defaults, with the tuning (WAL, synchronous=NORMAL,
+busy timeout, mmap, cache), and with the tuning plus the read-only listing
+pool. Each configuration starts from a fresh copy of the same database:
+
+    python -m benchmarks.load_test --workers 4 --seconds 10 --write-ratio 0.2
+
+Run from frontend/. Businesses come from a local POI store built from
+generate_data.py, so nothing touches the network.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_suite import load_generator
+from utils.osm import BUSINESS_TYPES
+
+MODES = {
+    "defaults": {"SQLITE_TUNING": "false", "READ_POOL": "false"},
+    "tuned": {"SQLITE_TUNING": "true", "READ_POOL": "false"},
+    "tuned+read pool": {"SQLITE_TUNING": "true", "READ_POOL": "true"},
+}
+
+
+def worker(index, username, write_ratio, seconds, start, results):
+    """One app process: logs in and runs the request mix until the time is up."""
+    from app import create_app, User, db
+
+    sys.stdout = open(os.devnull, "w")  # the routes print as they go
+    app = create_app(migrations=False)
+    app.logger.disabled = True  # failed requests are counted, not logged
+    client = app.test_client()
+    client.post("/login", data={"username": username, "password": "load"})
+    with app.app_context():
+        user_id = User.query.filter_by(username=username).first().id
+        names = [row[0] for row in db.session.execute(db.text("SELECT name FROM location LIMIT 200"))]
+    client.post("/businesses", json={"user_id": user_id, "page": 1})  # build the snapshot before timing
+
+    rng = random.Random(index)
+    reads, writes, failed = [], [], 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        if rng.random() < write_ratio:
+            response = client.post("/add-transaction", data={"businessName": rng.choice(names), "user_id": user_id,
+                                                             "visited": "on", "review_rating": rng.randint(1, 5)})
+            ok = response.status_code == 302
+            timings = writes
+        else:
+            response = client.post("/businesses", json={"user_id": user_id, "page": rng.randint(1, 5)})
+            ok = response.status_code == 200
+            timings = reads
+        if ok:
+            timings.append(time.perf_counter() - began)
+        else:
+            failed += 1
+    results.put({"reads": reads, "writes": writes, "failed": failed})
+
+
+def prepare(workdir, shops, users, seed):
+    """Builds the POI store and a database with users and locations; returns the database path."""
+    generator = load_generator()
+    records = generator.generate_shops(shops, len(BUSINESS_TYPES), center=generator.DEFAULT_CENTER,
+                                       type_names=BUSINESS_TYPES, seed=seed).to_dict(orient="records")
+    from utils.poi_store import POIStore
+    POIStore(records).save(os.path.join(workdir, "pois.json"))
+
+    db_path = os.path.join(workdir, "template.db")
+    os.environ.update({"DATABASE_URL": "sqlite:///" + db_path, "SQLITE_TUNING": "false", "READ_POOL": "false"})
+    from app import create_app, db, fetch_businesses, upsert_locations, User
+
+    app = create_app(migrations=False)
+    rng = random.Random(seed)
+    lat0, lon0 = generator.DEFAULT_CENTER
+    with app.app_context():
+        db.create_all()
+        for i in range(users):
+            user = User(username=f"load{i}", home_address=f"{i} Load St",
+                        latitude=lat0 + rng.uniform(-0.03, 0.03), longitude=lon0 + rng.uniform(-0.05, 0.05))
+            user.set_password("load")
+            db.session.add(user)
+            db.session.commit()
+            upsert_locations(fetch_businesses(user.latitude, user.longitude, 1000).rows())
+        db.engine.dispose()
+    return db_path
+
+
+def run_mode(name, env, template, workdir, args):
+    db_path = os.path.join(workdir, name.replace(" ", "_").replace("+", "_") + ".db")
+    shutil.copy(template, db_path)
+    os.environ.update(env)
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+
+    ctx = mp.get_context("spawn")  # fresh interpreters read the settings above
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(i, f"load{i}", args.write_ratio, args.seconds, start, results))
+             for i in range(args.workers)]
+    for proc in procs:
+        proc.start()
+    time.sleep(args.warmup)  # let every worker boot and log in
+    start.set()
+    collected = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    reads = np.concatenate([c["reads"] for c in collected]) if collected else np.empty(0)
+    writes = np.concatenate([c["writes"] for c in collected]) if collected else np.empty(0)
+    percentile = lambda times, q: float(np.percentile(times, q) * 1000) if len(times) else float("nan")
+    return {
+        "requests_per_s": (len(reads) + len(writes)) / args.seconds,
+        "reads_per_s": len(reads) / args.seconds,
+        "writes_per_s": len(writes) / args.seconds,
+        "read_p50_ms": percentile(reads, 50),
+        "read_p95_ms": percentile(reads, 95),
+        "write_p50_ms": percentile(writes, 50),
+        "write_p95_ms": percentile(writes, 95),
+        "failed": sum(c["failed"] for c in collected),
+    }
+
+
+def report(results):
+    print(f"{'configuration':<18} {'req/s':>8} {'reads/s':>8} {'writes/s':>9} {'read p95':>9} {'write p95':>10} "
+          f"{'failed':>7}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['requests_per_s']:>8.1f} {r['reads_per_s']:>8.1f} {r['writes_per_s']:>9.1f} "
+              f"{r['read_p95_ms']:>7.1f}ms {r['write_p95_ms']:>8.1f}ms {r['failed']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of requests that are writes")
+    parser.add_argument("--shops", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds to let workers boot")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--out", help="write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIzaLoadTestStandinKey")
+    os.environ.update({"POI_STORE_PATH": os.path.join(workdir, "pois.json"), "PREFETCH_WORKERS": "1",
+                       "PHOTO_STORE_PATH": os.path.join(workdir, "photos")})
+    os.environ.pop("DATABASE_READ_URL", None)
+    try:
+        template = prepare(workdir, args.shops, args.workers, args.seed)
+        results = {name: run_mode(name, MODES[name], template, workdir, args) for name in args.modes}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote {os.path.abspath(args.out)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
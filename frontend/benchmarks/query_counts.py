@@ -0,0 +1,106 @@
+"""
+SQL statement counts for a /businesses page.
+
+Builds a throwaway database from synthetic POIs, logs a user in, gives them
+transactions at the businesses on the first pages, then requests each page
+and counts the statements the app runs. Each page must take exactly
+EXPECTED_STATEMENTS, whatever the number of businesses or transactions on
+it: loading the user, the page's location ids, and their stars. A
+regression to one query per business fails loudly:
+
+    python -m benchmarks.query_counts
+
+Run from frontend/. The user cache is turned off so the user's SELECT is
+counted on every page.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from benchmarks.load_test import prepare
+
+EXPECTED_STATEMENTS = 3
+
+
+def count_pages(pages, seed):
+    """Statements run by each of the first `pages` /businesses pages, as [(page, count, businesses, starred)]."""
+    from app import create_app, db, Location, Transaction, User
+    from utils.query_plans import record_statements
+
+    sys.stdout = open(os.devnull, "w")  # the routes print as they go
+    try:
+        app = create_app(migrations=False)
+        client = app.test_client()
+        client.post("/login", data={"username": "load0", "password": "load"})
+        with app.app_context():
+            user_id = User.query.filter_by(username="load0").first().id
+        first = client.post("/businesses", json={"user_id": user_id, "page": 1}).get_json()
+
+        # Transactions at most of the listed businesses, so every page has stars to look up.
+        rng = random.Random(seed)
+        with app.app_context():
+            names = set()
+            for page in range(1, min(pages, first["total_pages"]) + 1):
+                names.update(b["name"] for b in
+                             client.post("/businesses", json={"user_id": user_id, "page": page}).get_json()["businesses"])
+            for location in Location.query.filter(Location.name.in_(names)):
+                for _ in range(rng.randint(1, 3)):
+                    db.session.add(Transaction(user_id=user_id, location_id=location.id,
+                                               trans_amount=rng.choice([-1, 0, 4.5]),
+                                               trans_visited_here=rng.random() < 0.5,
+                                               trans_left_a_review=rng.choice([-1, 3, 5])))
+            db.session.commit()
+            engine = db.engine
+
+        # Outside any app context, so each request gets its own session, as in production.
+        counts = []
+        for page in range(1, min(pages, first["total_pages"]) + 1):
+            with record_statements(engine) as statements:
+                response = client.post("/businesses", json={"user_id": user_id, "page": page})
+            businesses = response.get_json()["businesses"]
+            starred = sum(b["stars"] != "0/3" for b in businesses)
+            counts.append((page, len(statements), len(businesses), starred))
+        engine.dispose()
+        return counts
+    finally:
+        sys.stdout = sys.__stdout__
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--shops", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="querycounts-")
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIzaLoadTestStandinKey")
+    os.environ.update({"POI_STORE_PATH": os.path.join(workdir, "pois.json"), "PREFETCH_WORKERS": "1",
+                       "PHOTO_STORE_PATH": os.path.join(workdir, "photos"), "PASSWORD_HASH_WORKERS": "0",
+                       "USER_CACHE_SIZE": "0", "READ_POOL": "false"})
+    os.environ.pop("DATABASE_READ_URL", None)
+    try:
+        prepare(workdir, args.shops, 1, args.seed)
+        counts = count_pages(args.pages, args.seed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    for page, statements, businesses, starred in counts:
+        ok = statements == EXPECTED_STATEMENTS
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} page {page}: {statements} statements "
+              f"({businesses} businesses, {starred} with stars)")
+    if not counts or not any(starred for *_, starred in counts):
+        print("FAIL: no page had starred businesses, so the star lookup was not exercised")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+    print(f"\nOK: every /businesses page ran {EXPECTED_STATEMENTS} statements.")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,74 @@ load_dotenv()
 
 class Settings(BaseSettings):
     google_maps_api_key: str
+    # Override the Google Maps API host, e.g. to point at a local stand-in.
+    google_maps_base_url: str | None = None
+    database_url: str = "sqlite:///user.db"
+    # SQLite connection tuning (utils/db_tuning.py); SQLITE_TUNING=false keeps SQLite's defaults.
+    sqlite_tuning: bool = True
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    # Separate read-only connection pool for the listing routes, on DATABASE_READ_URL
+    # (e.g. a replica) or the main database.
+    read_pool: bool = False
+    database_read_url: str | None = None
+    read_pool_size: int = 5
+    # Sidecar file built by `python -m utils.poi_store import ...`; when set,
+    # nearby-business lookups are answered locally instead of via Overpass.
+    poi_store_path: str | None = None
+    # Overpass client: endpoint, per-request timeout, retries and overall deadline (seconds).
+    overpass_url: str = "https://overpass-api.de/api/interpreter"
+    overpass_timeout: float = 25.0
+    overpass_retries: int = 3
+    overpass_deadline: float = 45.0
+    # Overpass requests in flight at once per process; public Overpass allows about 2 per IP.
+    overpass_max_concurrent: int = 2
+    # Parse Overpass responses incrementally and keep only the top-k (bypasses the tile cache).
+    overpass_streaming: bool = False
+    # Tile cache for Overpass results; set a path to share it between workers on disk.
+    overpass_cache_enabled: bool = True
+    overpass_cache_path: str | None = None
+    overpass_cache_ttl: int = 24 * 3600
+    overpass_cache_size: int = 4096
+    # Start Overpass lookups at a small radius and grow it until every type has enough results.
+    adaptive_search: bool = True
+    adaptive_start_radius: int = 800  # meters
+    adaptive_growth: float = 2.0
+    # How many of the nearest businesses to keep per type, e.g. TYPE_THRESHOLDS='{"convenience": 5}'.
+    default_threshold: int = 17
+    type_thresholds: dict[str, int] = {}
+    # Geocoding provider: "google", or "local" to read addresses from geocoder_file.
+    geocoder: str = "google"
+    geocoder_file: str | None = None
+    geocode_cache_ttl: int = 30 * 24 * 3600
+    geocode_cache_size: int = 100000
+    # Seconds a user's computed business list is reused for paging.
+    snapshot_ttl: int = 600
+    # Background prefetch of a user's listings after login/registration.
+    prefetch_workers: int = 2
+    prefetch_queue_size: int = 256
+    # Rendered /businesses_all and /businesses_table bodies kept per user, and the
+    # smallest body (bytes) worth compressing.
+    response_cache_users: int = 1024
+    response_compress_min_size: int = 1024
+    # Transaction photos, stored by content hash; the largest accepted upload in bytes.
+    photo_store_path: str = "photos"
+    photo_max_bytes: int = 10 * 1024 * 1024
+    # Key partner kiosks send as X-Ingest-Key to POST /transactions/batch (disabled when unset).
+    ingest_api_key: str | None = None
+    ingest_max_batch: int = 10000
+    # Password hashing runs in this many worker processes (0: on the request thread),
+    # with this Werkzeug method and parameters; older hashes are upgraded at login.
+    password_hash_workers: int = 1
+    password_hash_method: str = "scrypt:32768:8:1"
+    password_salt_length: int = 16
+    # Users kept for Flask-Login's loader (0 disables), and seconds before an entry
+    # is re-read, which bounds how long other workers may show stale counters.
+    user_cache_size: int = 4096
+    user_cache_ttl: float = 10.0
 
     class Config:
         # Loads variables from a file named ".env" in the working directory.
@@ -0,0 +1,97 @@
+"""location natural key and user counters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00
+
+Adds Location.lat_key/lng_key with the (name, lat_key, lng_key) unique
+constraint used by the bulk upsert, plus a unique index on name for
+locations without coordinates (whose NULL keys the constraint doesn't
+cover), and User.star_count. Keys are backfilled with the app's rounding
+rule; duplicate locations are merged into the oldest one, moving their
+transactions over. Both user counters are recomputed from the transactions.
+"""
+import math
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+location = sa.table('location', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                    sa.column('latitude', sa.Float), sa.column('longitude', sa.Float),
+                    sa.column('lat_key', sa.Integer), sa.column('lng_key', sa.Integer))
+transactions = sa.table('transactions', sa.column('location_id', sa.Integer))
+
+
+def coordinate_key(value):
+    # Must match app.coordinate_key: 4 decimals, halves rounded up.
+    return math.floor(value * 10000 + 0.5)
+
+
+def upgrade():
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lat_key', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('lng_key', sa.Integer(), nullable=True))
+
+    conn = op.get_bind()
+    by_key = defaultdict(list)
+    for row in conn.execute(sa.select(location.c.id, location.c.name, location.c.latitude, location.c.longitude)
+                            .order_by(location.c.id)):
+        if row.latitude is None or row.longitude is None:
+            key = (row.name, None, None)
+        else:
+            key = (row.name, coordinate_key(row.latitude), coordinate_key(row.longitude))
+        by_key[key].append(row.id)
+
+    keys, merges, duplicates = [], [], []
+    for (name, lat_key, lng_key), ids in by_key.items():
+        keep = ids[0]
+        if lat_key is not None:
+            keys.append({"row_id": keep, "lat_key": lat_key, "lng_key": lng_key})
+        merges += [{"keep": keep, "duplicate": duplicate} for duplicate in ids[1:]]
+        duplicates += ids[1:]
+    if keys:
+        conn.execute(location.update().where(location.c.id == sa.bindparam("row_id"))
+                     .values(lat_key=sa.bindparam("lat_key"), lng_key=sa.bindparam("lng_key")), keys)
+    if merges:
+        conn.execute(transactions.update().where(transactions.c.location_id == sa.bindparam("duplicate"))
+                     .values(location_id=sa.bindparam("keep")), merges)
+        conn.execute(location.delete().where(location.c.id.in_(duplicates)))
+
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_location_natural_key', ['name', 'lat_key', 'lng_key'])
+        batch_op.create_index('uq_location_name_no_coords', ['name'], unique=True,
+                              sqlite_where=sa.text('lat_key IS NULL'), postgresql_where=sa.text('lat_key IS NULL'))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('star_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Same rules as app.star_conditions() and app.transaction_reward().
+    op.execute('UPDATE "user" SET star_count = ('
+               "SELECT COALESCE(SUM("
+               "CASE WHEN trans_amount NOT IN (0, -1) THEN 1 ELSE 0 END"
+               " + CASE WHEN trans_visited_here THEN 1 ELSE 0 END"
+               " + CASE WHEN trans_left_a_review NOT IN (-1, 0) THEN 1 ELSE 0 END), 0)"
+               ' FROM transactions WHERE transactions.user_id = "user".id), '
+               "cummulative_reward = ("
+               "SELECT COALESCE(SUM(trans_amount"
+               " + 3 * CASE WHEN trans_left_a_review > 0 THEN trans_left_a_review ELSE 0 END), 0)"
+               ' FROM transactions WHERE transactions.user_id = "user".id)')
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('star_count')
+
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.drop_index('uq_location_name_no_coords')
+        batch_op.drop_constraint('uq_location_natural_key', type_='unique')
+        batch_op.drop_column('lng_key')
+        batch_op.drop_column('lat_key')
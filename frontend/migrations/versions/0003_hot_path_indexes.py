@@ -0,0 +1,30 @@
+"""indexes for transaction and location lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00
+
+Location lookups by name use uq_location_natural_key from 0002, whose
+leading column is name, so location needs no index of its own.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_user_location', ['user_id', 'location_id'], unique=False)
+        batch_op.create_index('ix_transactions_location_id', ['location_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_location_id')
+        batch_op.drop_index('ix_transactions_user_location')
@@ -0,0 +1,47 @@
+"""nearest-location and location coverage tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('location_coverage',
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('radius_miles', sa.Float(), nullable=False),
+    sa.Column('users_within', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ),
+    sa.PrimaryKeyConstraint('location_id')
+    )
+    op.create_table('user_nearby_location',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('distance', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'rank')
+    )
+    with op.batch_alter_table('user_nearby_location', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_nearby_location_location_id'), ['location_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_nearby_location', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_nearby_location_location_id'))
+
+    op.drop_table('user_nearby_location')
+    op.drop_table('location_coverage')
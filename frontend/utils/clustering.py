@@ -0,0 +1,148 @@
+"""
+Grid clustering of map markers per zoom level.
+
+At zoom z the map is 256 * 2**z pixels wide in Web Mercator. Points are
+bucketed into square cells of cell_px screen pixels, and each non-empty cell
+becomes one cluster at the centroid of its points. A zoom's grid is built
+once, in one vectorized pass, the first time that zoom is asked for. A
+viewport query then looks up only the cells the bbox covers, so its cost
+grows with the clusters on screen rather than the points in the set.
+"""
+import math
+
+import numpy as np
+
+from utils.radius_calc import factorize
+
+MAX_ZOOM = 22
+MAX_LATITUDE = 85.05112878  # Web Mercator's limit
+
+
+def mercator(lats, lons):
+    """Normalized Web Mercator (x, y) in [0, 1], y growing southwards."""
+    lats = np.clip(np.asarray(lats, dtype=float), -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(lons, dtype=float) + 180.0) / 360.0
+    y = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lats) / 2)) / (2 * np.pi)
+    return x, y
+
+
+class ZoomGrid:
+    """The clusters of one zoom level, with a cell -> cluster lookup."""
+
+    def __init__(self, index, zoom, cell_px):
+        self.zoom = zoom
+        self.cell = cell_px / (256.0 * 2 ** zoom)  # cell size in normalized Mercator units
+        self.columns = max(1, math.ceil(1.0 / self.cell))
+        ix = np.minimum((index.x / self.cell).astype(np.int64), self.columns - 1)
+        iy = np.minimum((index.y / self.cell).astype(np.int64), self.columns - 1)
+
+        keys, members = np.unique(ix * self.columns + iy, return_inverse=True)
+        n = len(keys)
+        self.ix, self.iy = keys // self.columns, keys % self.columns
+        self.counts = np.bincount(members, minlength=n)
+        self.lats = np.bincount(members, weights=index.lats, minlength=n) / self.counts
+        self.lons = np.bincount(members, weights=index.lons, minlength=n) / self.counts
+        self.type_counts = np.bincount(members * len(index.type_labels) + index.type_codes,
+                                       minlength=n * len(index.type_labels)).reshape(n, len(index.type_labels))
+        # Point indices grouped by cluster, and each cluster's bounds.
+        self.order = np.argsort(members, kind="stable")
+        self.bounds = np.concatenate(([0], np.cumsum(self.counts)))
+        if n:
+            starts = self.bounds[:-1]
+            lats, lons = index.lats[self.order], index.lons[self.order]
+            self.boxes = np.column_stack((np.minimum.reduceat(lats, starts), np.minimum.reduceat(lons, starts),
+                                          np.maximum.reduceat(lats, starts), np.maximum.reduceat(lons, starts)))
+        else:
+            self.boxes = np.empty((0, 4))
+        self.by_cell = dict(zip(keys.tolist(), range(n)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def members(self, cluster):
+        return self.order[self.bounds[cluster]:self.bounds[cluster + 1]]
+
+    def _cell(self, value):
+        return min(max(int(value / self.cell), 0), self.columns - 1)
+
+    def _cell_ranges(self, bbox):
+        south, west, north, east = bbox
+        x_west, y_north = mercator(north, west)
+        x_east, y_south = mercator(south, east)
+        rows = range(self._cell(y_north), self._cell(y_south) + 1)
+        first, last = self._cell(x_west), self._cell(x_east)
+        if west <= east:
+            return [range(first, last + 1)], rows
+        # Viewport across the antimeridian.
+        return [range(first, self.columns), range(0, last + 1)], rows
+
+    def visible(self, bbox=None):
+        """Indices of the clusters whose cell intersects bbox (south, west, north, east); all if None."""
+        if bbox is None:
+            return np.arange(len(self))
+        columns, rows = self._cell_ranges(bbox)
+        cells = sum(len(c) for c in columns) * len(rows)
+        if cells > len(self):
+            # A viewport far larger than this zoom's screen: scanning the clusters is cheaper.
+            in_rows = (self.iy >= rows.start) & (self.iy < rows.stop)
+            in_columns = np.zeros(len(self), dtype=bool)
+            for c in columns:
+                in_columns |= (self.ix >= c.start) & (self.ix < c.stop)
+            return np.flatnonzero(in_rows & in_columns)
+        found = []
+        for c in columns:
+            for ix in c:
+                base = ix * self.columns
+                for iy in rows:
+                    cluster = self.by_cell.get(base + iy)
+                    if cluster is not None:
+                        found.append(cluster)
+        return np.asarray(found, dtype=np.int64)
+
+
+class ClusterIndex:
+    """
+    Clusters a fixed list of map items (dicts with latitude, longitude and type)
+    at any zoom, building each zoom's grid on first use.
+    """
+
+    def __init__(self, items, cell_px=60):
+        self.items = [item for item in items if item["latitude"] is not None and item["longitude"] is not None]
+        self.cell_px = cell_px
+        self.lats = np.array([item["latitude"] for item in self.items], dtype=float)
+        self.lons = np.array([item["longitude"] for item in self.items], dtype=float)
+        self.x, self.y = mercator(self.lats, self.lons)
+        self.type_codes, self.type_labels = factorize([item.get("type") for item in self.items])
+        self._grids = {}
+
+    def grid(self, zoom):
+        zoom = max(0, min(int(zoom), MAX_ZOOM))
+        grid = self._grids.get(zoom)
+        if grid is None:
+            grid = self._grids[zoom] = ZoomGrid(self, zoom, self.cell_px)
+        return grid
+
+    def query(self, zoom, bbox=None):
+        """
+        The map's content at zoom inside bbox (south, west, north, east).
+
+        :return: (clusters, items): a dict per cluster of two or more points
+                 (centroid, count, per-type counts, bounds), and the items
+                 that sit alone in their cell.
+        """
+        grid = self.grid(zoom)
+        clusters, singles = [], []
+        for cluster in grid.visible(bbox).tolist():
+            members = grid.members(cluster)
+            if len(members) == 1:
+                singles.append(self.items[members[0]])
+                continue
+            clusters.append({
+                "latitude": float(grid.lats[cluster]),
+                "longitude": float(grid.lons[cluster]),
+                "count": int(grid.counts[cluster]),
+                "types": {label: int(count) for label, count in zip(self.type_labels, grid.type_counts[cluster])
+                          if count},
+                "bbox": grid.boxes[cluster].tolist(),
+            })
+        return clusters, singles
@@ -0,0 +1,93 @@
+"""
+Connection tuning for the app's database, applied through SQLAlchemy
+connect events so every pooled connection gets it.
+
+SQLite (the default) is switched to write-ahead logging, so readers no longer
+wait for a writer and vice versa, with synchronous=NORMAL (safe in WAL mode;
+a crash can lose the last commits but never corrupts the file), a busy
+timeout instead of an immediate "database is locked", and larger mmap and
+page caches. Other databases are left alone.
+
+make_read_engine() builds a second, read-only pool for routes that only read.
+"""
+from sqlalchemy import create_engine, event
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def sqlite_pragmas(wal=True, synchronous="NORMAL", busy_timeout_ms=5000, mmap_size=256 * 1024 * 1024,
+                   cache_size_kib=64 * 1024, query_only=False):
+    """
+    The PRAGMA statements for one connection.
+
+    :param wal: Use write-ahead logging (journal_mode=WAL).
+    :param synchronous: One of SYNCHRONOUS_MODES.
+    :param busy_timeout_ms: How long to wait on a lock before failing.
+    :param mmap_size: Bytes of the file to memory-map (0 disables it).
+    :param cache_size_kib: Page cache per connection, in KiB.
+    :param query_only: Refuse writes on this connection.
+    """
+    synchronous = synchronous.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Unknown synchronous mode {synchronous!r}; expected one of {SYNCHRONOUS_MODES}")
+    pragmas = []
+    if wal:
+        pragmas.append("PRAGMA journal_mode=WAL")
+    pragmas += [
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(mmap_size)}",
+        f"PRAGMA cache_size={-int(cache_size_kib)}",  # negative: KiB rather than pages
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def tune_engine(engine, **options):
+    """
+    Runs sqlite_pragmas(**options) on each new connection of a SQLite engine.
+
+    :return: The pragmas applied, or [] for other databases.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+    pragmas = sqlite_pragmas(**options)
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return pragmas
+
+
+def current_pragmas(connection):
+    """{pragma: value} as a connection sees them; for checking the tuning took effect."""
+    names = ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size", "query_only")
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+def make_read_engine(url, pool_size=5, **options):
+    """
+    A separate engine whose connections refuse writes: PRAGMA query_only on
+    SQLite, read-only transactions on PostgreSQL. Point url at a replica, or
+    at the main database to keep listing reads out of the writers' pool.
+
+    :param options: sqlite_pragmas options (SQLite only).
+    """
+    engine = create_engine(url, pool_size=pool_size, pool_pre_ping=True)
+    if engine.dialect.name == "sqlite":
+        tune_engine(engine, query_only=True, **options)
+    elif engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.close()
+            dbapi_connection.commit()
+    return engine
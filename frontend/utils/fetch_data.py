@@ -1,67 +1,159 @@
-import requests
-import numpy as np 
-from geopy.distance import geodesic
-import pandas as pd
+import logging
+from collections import Counter
 
-def get_nearby_businesses(latitude, longitude, radius=1000):
+from utils.geo import METERS_PER_MILE
+from utils.metrics import span
+from utils.osm import BUSINESS_TYPES, parse_element
+from utils.overpass_cache import TileCache, get_tile_cache
+from utils.overpass_client import OverpassError, get_overpass_client
+from utils.overpass_stream import iter_records, with_distances
+from utils.poi_store import get_poi_store
+from utils.records import NearbySet
+
+log = logging.getLogger(__name__)
+
+
+def fetch_around_records(radius, latitude, longitude, business_types=BUSINESS_TYPES):
     """
-    Fetches nearby businesses of multiple types using OpenStreetMap's Overpass API.
+    Fetches business records within radius meters of a point, or None on an API error.
+    """
+    try:
+        elements = get_overpass_client().fetch_around(radius, latitude, longitude, business_types)
+    except OverpassError as e:
+        log.warning("Overpass lookup failed: %s", e)
+        return None
+    return [parse_element(element) for element in elements]
+
+
+def fetch_bbox_records(bboxes, business_types=BUSINESS_TYPES):
+    """
+    Fetches business records inside any of several (south, west, north, east) boxes,
+    concurrently; used to fill the tile cache.
+    """
+    try:
+        elements = get_overpass_client().fetch_bboxes(bboxes, business_types)
+    except OverpassError as e:
+        log.warning("Overpass lookup failed: %s", e)
+        return None
+    return [parse_element(element) for element in elements]
+
+
+def stream_nearby_records(latitude, longitude, radius=1000):
+    """
+    Streams business records (with distance in miles) within radius meters,
+    parsing the Overpass response incrementally instead of loading it whole.
+    Feed the result to radius_calc.find_radius_stream.
+
+    :raises OverpassError: If the query fails.
+    """
+    elements = get_overpass_client().stream_around(radius, latitude, longitude)
+    return with_distances(iter_records(elements), latitude, longitude)
+
+
+def get_nearby_businesses(latitude, longitude, radius=1000, k=None, store=None, cache=None, exact=False):
+    """
+    Fetches nearby businesses of multiple types, from the local POI store when one
+    is configured and from OpenStreetMap's Overpass API otherwise. Overpass results
+    go through the tile cache, so only tiles nobody has asked for recently are fetched.
 
     :param latitude: Latitude of the location.
     :param longitude: Longitude of the location.
-    :param business_types: List of business types (OSM tags like 'fast_food', 'restaurant', 'convenience').
     :param radius: Search radius in meters (default: 1000m).
-    :return: List of businesses with name, address, type, latitude, and longitude.
+    :param k: If given, return only the k nearest businesses within the radius (store only).
+    :param store: POIStore to query instead of the process-wide default.
+    :param cache: TileCache to use instead of the process-wide default.
+    :param exact: Compute distances with geopy's geodesic instead of the vectorized haversine.
+    :return: DataFrame of businesses with name, address, type, latitude, longitude and distance (miles).
+    """
+    nearby = nearby_records(latitude, longitude, radius, k=k, store=store, cache=cache, exact=exact)
+    if nearby is None:
+        return []
+    return nearby.to_frame()
+
+
+def nearby_records(latitude, longitude, radius=1000, k=None, store=None, cache=None, exact=False):
     """
-    business_types = ["fast_food", "restaurant", "convenience"]  # Modify based on OSM tags
-    encodings = {"fast_food": "0", "restaurant": "1", "convenience": "2"}
-    overpass_url = "https://overpass-api.de/api/interpreter"
-    
-    # Build Overpass Query for multiple business types
-    query_parts = []
-    for business_type in business_types:
-        if business_type in ["fast_food", "restaurant"]:  # These are categorized under "amenity"
-            query_parts.append(f'node["amenity"="{business_type}"](around:{radius},{latitude},{longitude});')
-            query_parts.append(f'way["amenity"="{business_type}"](around:{radius},{latitude},{longitude});')
-            query_parts.append(f'relation["amenity"="{business_type}"](around:{radius},{latitude},{longitude});')
-        else:  # Stores are categorized under "shop"
-            query_parts.append(f'node["shop"="{business_type}"](around:{radius},{latitude},{longitude});')
-            query_parts.append(f'way["shop"="{business_type}"](around:{radius},{latitude},{longitude});')
-            query_parts.append(f'relation["shop"="{business_type}"](around:{radius},{latitude},{longitude});')
-
-    query = f"""
-    [out:json];
-    (
-      {"".join(query_parts)}
-    );
-    out center;
+    get_nearby_businesses without pandas: the same lookup as a NearbySet.
+
+    :return: NearbySet, nearest first, or None on an API error.
     """
+    store = store if store is not None else get_poi_store()
+    if store is not None:
+        with span("poi_store"):
+            if k is not None:
+                rows = [r for r in store.nearest(latitude, longitude, k) if r["distance"] <= radius / METERS_PER_MILE]
+            else:
+                rows = store.within(latitude, longitude, radius / METERS_PER_MILE)
+            return NearbySet.from_rows(rows)
 
-    response = requests.get(overpass_url, params={"data": query})
-    data = response.json()
+    cache = cache if cache is not None else get_tile_cache()
+    with span("overpass"):
+        if cache is not None:
+            records = cache.records_within(latitude, longitude, radius / METERS_PER_MILE, fetch_bbox_records)
+        else:
+            records = fetch_around_records(radius, latitude, longitude)
 
-    if "elements" not in data:
-        print("Error: No results found or API error")
-        return []
+    if records is None:
+        return None
+
+    with span("distance"):
+        return NearbySet.from_records(records, latitude, longitude, exact=exact)
+
+
+def search_nearby_adaptive(latitude, longitude, threshold=16, thresholds=None, max_radius=8046,
+                           start_radius=800, growth=2.0, business_types=BUSINESS_TYPES, cache=None):
+    """
+    Expanding-radius version of get_nearby_businesses for Overpass lookups
+    (with a POI store configured, a full-radius lookup is already cheap).
 
-    businesses = pd.DataFrame(columns=["name", "address", "type", "latitude", "longitude", "distance"])
-    for element in data["elements"]:
-        tags = element.get("tags", {})
-        name = tags.get("name", "Unknown Name")
-        address = tags.get("addr:street", "Unknown Address")
-        business_type = tags.get("amenity", tags.get("shop", "Unknown Type"))  # Detect type from OSM tags
-        lat = element.get("lat", element.get("center", {}).get("lat"))  # Latitude
-        lon = element.get("lon", element.get("center", {}).get("lon"))  # Longitude
-        dist = geodesic((latitude,longitude),(lat,lon)).miles # Distance in meters
-        
-        # print(dist)
-        businesses = pd.concat([businesses, pd.DataFrame([[name, address, business_type, lat, lon, dist]], columns=businesses.columns)], ignore_index=True)
-
-    # print(data["elements"][0])
-    # Sort buisnesses by distance
-    businesses = businesses.sort_values(by='distance').reset_index(drop=True)
-    
-    return businesses
+    Starts at start_radius and multiplies it by growth until every business type
+    has at least its threshold of results, or max_radius is reached. Once a type
+    has k results within r, its k nearest overall are all within r, so
+    find_radius over the result matches find_radius over a max_radius search.
+    Rings are fetched through the tile cache (a private one if the shared cache
+    is disabled), so each round only downloads the tiles the last one lacked.
+
+    :param threshold: Results wanted for types not listed in thresholds.
+    :param thresholds: Optional {type: count} overriding threshold per type.
+    :param max_radius: Largest radius to search, in meters.
+    :param start_radius: First radius to try, in meters.
+    :param growth: Factor the radius grows by each round.
+    :return: (NearbySet or None on an API error, final radius in meters, rounds taken).
+    """
+    cache = cache if cache is not None else get_tile_cache() or TileCache()
+    wanted = {t: (thresholds or {}).get(t, threshold) for t in business_types}
+    radius = min(start_radius, max_radius)
+    rounds = 0
+    while True:
+        rounds += 1
+        with span("overpass"):
+            records = cache.records_within(latitude, longitude, radius / METERS_PER_MILE, fetch_bbox_records,
+                                           business_types)
+        if records is None:
+            return None, radius, rounds
+        if radius >= max_radius:
+            break
+        counts = Counter(r["type"] for r in records)
+        if all(counts[t] >= k for t, k in wanted.items()):
+            break
+        radius = min(max_radius, radius * growth)
+
+    # Distances and sorting only for the final round.
+    with span("distance"):
+        return NearbySet.from_records(records, latitude, longitude), radius, rounds
+
+
+def records_to_frame(records, latitude, longitude, exact=False):
+    """
+    Builds the sorted businesses DataFrame from parsed records in one pass.
+
+    :param records: Records from parse_element.
+    :param latitude: Latitude of the user.
+    :param longitude: Longitude of the user.
+    :param exact: Use geopy's geodesic distance instead of the vectorized haversine.
+    :return: DataFrame with COLUMNS, nearest first.
+    """
+    return NearbySet.from_records(records, latitude, longitude, exact=exact).to_frame()
 
 
 if __name__ == "__main__":
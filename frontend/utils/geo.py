@@ -0,0 +1,35 @@
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.7613
+METERS_PER_MILE = 1609.34
+
+
+def haversine_miles(latitude, longitude, lats, lons):
+    """
+    Great-circle distance in miles from one point to one or many points.
+
+    :param latitude: Latitude of the origin.
+    :param longitude: Longitude of the origin.
+    :param lats: Latitude (scalar or array) of the destination(s).
+    :param lons: Longitude (scalar or array) of the destination(s).
+    :return: Distance(s) in miles, same shape as lats/lons.
+    """
+    lat1 = np.radians(latitude)
+    lon1 = np.radians(longitude)
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lon2 = np.radians(np.asarray(lons, dtype=float))
+
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(latitude, longitude, radius_miles):
+    """
+    Lat/lon box that fully contains a circle of radius_miles around a point.
+
+    :return: (south, west, north, east) in degrees.
+    """
+    dlat = np.degrees(radius_miles / EARTH_RADIUS_MILES)
+    coslat = max(np.cos(np.radians(latitude)), 1e-6)
+    dlon = min(np.degrees(radius_miles / (EARTH_RADIUS_MILES * coslat)), 180.0)
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
@@ -0,0 +1,98 @@
+import csv
+import json
+import re
+from abc import ABC, abstractmethod
+
+
+def normalize_address(address):
+    """
+    Cache key for an address: case-folded, punctuation-insensitive and with
+    whitespace collapsed, so retries with small typing differences still hit.
+    """
+    address = address.casefold()
+    address = re.sub(r"[.,;#]+", " ", address)
+    return " ".join(address.split())
+
+
+class Geocoder(ABC):
+    """Provider interface: turns an address into (latitude, longitude) or None."""
+
+    name = "base"
+
+    @abstractmethod
+    def geocode(self, address):
+        """
+        :param address: Free-form address as the user typed it.
+        :return: (latitude, longitude), or None if the provider can't place it.
+        """
+
+
+class GoogleMapsGeocoder(Geocoder):
+    """Google Geocoding API; the client is only built on first use."""
+
+    name = "google"
+
+    def __init__(self, api_key, **client_kwargs):
+        self.api_key = api_key
+        self.client_kwargs = client_kwargs
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import googlemaps
+            self._client = googlemaps.Client(key=self.api_key, **self.client_kwargs)
+        return self._client
+
+    def geocode(self, address):
+        result = self.client.geocode(address)
+        if not result:
+            return None
+        location = result[0].get("geometry", {}).get("location", {})
+        try:
+            return float(location.get("lat")), float(location.get("lng"))
+        except (TypeError, ValueError):
+            return None
+
+
+class LocalFileGeocoder(Geocoder):
+    """
+    Offline stand-in backed by a file of known addresses, for tests and load runs.
+
+    Accepts a CSV with address,latitude,longitude columns or a JSON object
+    mapping address -> [latitude, longitude].
+    """
+
+    name = "local"
+
+    def __init__(self, path):
+        self.path = path
+        self.addresses = {}
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                for address, (lat, lng) in json.load(f).items():
+                    self.addresses[normalize_address(address)] = (float(lat), float(lng))
+        else:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self.addresses[normalize_address(row["address"])] = (float(row["latitude"]), float(row["longitude"]))
+
+    def geocode(self, address):
+        return self.addresses.get(normalize_address(address))
+
+
+GEOCODERS = {
+    GoogleMapsGeocoder.name: lambda settings: GoogleMapsGeocoder(
+        settings.google_maps_api_key,
+        **({"base_url": settings.google_maps_base_url} if settings.google_maps_base_url else {})),
+    LocalFileGeocoder.name: lambda settings: LocalFileGeocoder(settings.geocoder_file),
+}
+
+
+def make_geocoder(settings):
+    """Builds the provider named by settings.geocoder."""
+    try:
+        factory = GEOCODERS[settings.geocoder]
+    except KeyError:
+        raise ValueError(f"Unknown geocoder {settings.geocoder!r}; expected one of {sorted(GEOCODERS)}")
+    return factory(settings)
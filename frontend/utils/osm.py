@@ -0,0 +1,30 @@
+# OSM tags we serve, and the key each one lives under.
+BUSINESS_TYPES = ["fast_food", "restaurant", "convenience"]
+TAG_KEYS = {"fast_food": "amenity", "restaurant": "amenity", "convenience": "shop"}
+
+COLUMNS = ["name", "address", "type", "latitude", "longitude", "distance"]
+
+
+def matched_types(tags):
+    """The served business types an element's tags match (what an Overpass query found it by)."""
+    return [business_type for business_type in BUSINESS_TYPES if tags.get(TAG_KEYS[business_type]) == business_type]
+
+
+def parse_element(element):
+    """
+    Turns one Overpass element into a business record (without distance).
+
+    :param element: Element dict from an Overpass JSON response.
+    :return: Dict with osm_id, name, address, type, matched_types, latitude and longitude.
+    """
+    tags = element.get("tags", {})
+    center = element.get("center", {})
+    return {
+        "osm_id": f"{element.get('type', 'node')}/{element.get('id')}",
+        "name": tags.get("name", "Unknown Name"),
+        "address": tags.get("addr:street", "Unknown Address"),
+        "type": tags.get("amenity", tags.get("shop", "Unknown Type")),  # Detect type from OSM tags
+        "matched_types": matched_types(tags),
+        "latitude": element.get("lat", center.get("lat")),
+        "longitude": element.get("lon", center.get("lon")),
+    }
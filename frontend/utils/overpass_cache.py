@@ -0,0 +1,337 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.geo import bounding_box, haversine_miles
+from utils.osm import BUSINESS_TYPES
+
+
+class MemoryBackend:
+    """In-process TTL + LRU store for tile payloads."""
+
+    def __init__(self, max_entries=4096, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached and fresh."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        with self._lock:
+            expires_at = time.time() + self.ttl
+            for key, value in items.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """On-disk TTL + LRU store for tile payloads, shared by every worker on the box."""
+
+    def __init__(self, path, max_entries=100000, ttl=24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tile_cache ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, last_used REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_tile_cache_last_used ON tile_cache (last_used)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires_at, value FROM tile_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[0] < now:
+                conn.execute("DELETE FROM tile_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE tile_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[1])
+
+    def get_many(self, keys, chunk_size=500):
+        """
+        {key: value} for the keys that are cached and fresh, read over one
+        connection with a SELECT ... IN per chunk of keys.
+        """
+        now = time.time()
+        keys = list(keys)
+        found, expired = {}, []
+        with self._connect() as conn:
+            for start in range(0, len(keys), chunk_size):
+                chunk = keys[start:start + chunk_size]
+                rows = conn.execute(
+                    f"SELECT key, expires_at, value FROM tile_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, expires_at, value in rows:
+                    if expires_at < now:
+                        expired.append((key,))
+                    else:
+                        found[key] = json.loads(value)
+            if expired:
+                conn.executemany("DELETE FROM tile_cache WHERE key = ?", expired)
+            if found:
+                conn.executemany("UPDATE tile_cache SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tile_cache (key, expires_at, last_used, value) VALUES (?, ?, ?, ?)",
+                [(key, now + self.ttl, now, json.dumps(value)) for key, value in items.items()],
+            )
+            conn.execute(
+                "DELETE FROM tile_cache WHERE key IN ("
+                " SELECT key FROM tile_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tile_cache").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tile_cache")
+
+
+class TileCache:
+    """
+    Caches Overpass results per (tile, business type).
+
+    The map is cut into tile_size-degree squares. A radius query is answered
+    from the tiles its bounding box touches. Missing tiles are fetched as
+    tile-aligned rectangles, passed together to the fetch callable (one
+    bounding-box request each), and stored for the next caller.
+    """
+
+    def __init__(self, backend=None, tile_size=0.02, min_fill=0.5):
+        """
+        :param backend: MemoryBackend or SQLiteBackend (in-memory by default).
+        :param tile_size: Tile edge in degrees.
+        :param min_fill: Fetch the missing tiles' bounding box in one request whenever
+                         they make up at least this share of it (e.g. the ring a growing
+                         search adds), instead of one request per rectangle.
+        """
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.tile_size = tile_size
+        self.min_fill = min_fill
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        # Counters are bumped from every request thread.
+        self._stats_lock = threading.Lock()
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses, fetches = self.hits, self.misses, self.fetches
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "fetches": fetches,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+    def tile_of(self, lat, lon):
+        return int(math.floor(lat / self.tile_size)), int(math.floor(lon / self.tile_size))
+
+    def tile_bbox(self, tile):
+        row, col = tile
+        return row * self.tile_size, col * self.tile_size, (row + 1) * self.tile_size, (col + 1) * self.tile_size
+
+    def tiles_covering(self, bbox):
+        south, west, north, east = bbox
+        row0, col0 = self.tile_of(south, west)
+        row1, col1 = self.tile_of(north, east)
+        return [(r, c) for r in range(row0, row1 + 1) for c in range(col0, col1 + 1)]
+
+    def _key(self, tile, business_type):
+        return f"{business_type}:{self.tile_size}:{tile[0]}:{tile[1]}"
+
+    def records_within(self, latitude, longitude, radius_miles, fetch, business_types=BUSINESS_TYPES):
+        """
+        Businesses within radius_miles of a point, assembled from cached tiles.
+
+        :param fetch: Callable (bboxes, business_types) -> list of records or None,
+                      given the (south, west, north, east) rectangles of the tiles
+                      that are not cached yet.
+        :return: List of records (without distance), or None if a fetch failed.
+        """
+        tiles = self.tiles_covering(bounding_box(latitude, longitude, radius_miles))
+        records = {}
+        missing_tiles, missing_types = [], set()
+        hits = misses = 0
+        found = self.backend.get_many([self._key(tile, bt) for tile in tiles for bt in business_types])
+        for tile in tiles:
+            for business_type in business_types:
+                cached = found.get(self._key(tile, business_type))
+                if cached is None:
+                    misses += 1
+                    missing_tiles.append(tile)
+                    missing_types.add(business_type)
+                else:
+                    hits += 1
+                    records.update((r["osm_id"], r) for r in cached)
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+        if missing_tiles:
+            fetched = self._fetch_tiles(missing_tiles, sorted(missing_types), fetch)
+            if fetched is None:
+                return None
+            records.update((r["osm_id"], r) for r in fetched)
+
+        records = list(records.values())
+        if not records:
+            return []
+        dists = haversine_miles(latitude, longitude, [r["latitude"] for r in records], [r["longitude"] for r in records])
+        return [r for r, d in zip(records, dists) if d <= radius_miles]
+
+    @staticmethod
+    def _rectangles(tiles):
+        """
+        Covers a set of tiles with few (row0, col0, row1, col1) rectangles and
+        no extra tiles: horizontal runs per row, merged with identical runs in
+        the rows below. A ring of missing tiles around a cached core becomes
+        four rectangles rather than one box that re-fetches the core.
+        """
+        runs_by_row = {}
+        for row in sorted({r for r, _ in tiles}):
+            cols = sorted(c for r, c in tiles if r == row)
+            runs, start = [], cols[0]
+            for prev, col in zip(cols, cols[1:] + [None]):
+                if col is None or col != prev + 1:
+                    runs.append((start, prev))
+                    start = col
+            runs_by_row[row] = runs
+
+        open_rects, rects = {}, []
+        for row in sorted(runs_by_row):
+            still_open = {}
+            for run in runs_by_row[row]:
+                rect = open_rects.pop(run, None)
+                if rect is not None and rect[2] == row - 1:
+                    still_open[run] = (rect[0], run[0], row, run[1])
+                else:
+                    if rect is not None:
+                        rects.append(rect)
+                    still_open[run] = (row, run[0], row, run[1])
+            rects.extend(open_rects.values())
+            open_rects = still_open
+        rects.extend(open_rects.values())
+        return rects
+
+    def _fetch_rectangles(self, tiles):
+        """The rectangles to request: one box if the missing tiles fill enough of it, else _rectangles."""
+        rects = self._rectangles(tiles)
+        if len(rects) > 1:
+            row0, col0 = min(r[0] for r in rects), min(r[1] for r in rects)
+            row1, col1 = max(r[2] for r in rects), max(r[3] for r in rects)
+            if len(tiles) >= self.min_fill * (row1 - row0 + 1) * (col1 - col0 + 1):
+                return [(row0, col0, row1, col1)]
+        return rects
+
+    def _fetch_tiles(self, tiles, business_types, fetch):
+        # All rectangles go to fetch together, which requests them concurrently;
+        # since they are tile-aligned, each tile inside them is fully covered and
+        # can be stored (a cached tile inside a merged box is refreshed).
+        rects = self._fetch_rectangles(set(tiles))
+        bboxes = [self.tile_bbox((row0, col0))[:2] + self.tile_bbox((row1, col1))[2:]
+                  for row0, col0, row1, col1 in rects]
+        with self._stats_lock:
+            self.fetches += len(bboxes)
+        fetched = fetch(bboxes, business_types)
+        if fetched is None:
+            return None
+
+        by_key = {self._key((r, c), bt): []
+                  for row0, col0, row1, col1 in rects
+                  for r in range(row0, row1 + 1) for c in range(col0, col1 + 1) for bt in business_types}
+        for record in fetched:
+            if record["latitude"] is None or record["longitude"] is None:
+                continue
+            # Filed under the tags the query matched, not the derived type: a
+            # shop=convenience that is also an amenity=cafe has type "cafe".
+            tile = self.tile_of(record["latitude"], record["longitude"])
+            for business_type in record.get("matched_types") or [record["type"]]:
+                key = self._key(tile, business_type)
+                if key in by_key:
+                    by_key[key].append(record)
+        self.backend.set_many(by_key)
+
+        wanted = {self._key(tile, bt) for tile in tiles for bt in business_types}
+        return [r for key, value in by_key.items() if key in wanted for r in value]
+
+
+# ----------------------------
+# Process-wide default cache
+# ----------------------------
+_default_cache = TileCache()
+
+
+def configure_tile_cache(path=None, ttl=24 * 3600, max_entries=4096, tile_size=0.02, enabled=True):
+    """
+    Replaces the default tile cache. With a path, tiles are kept in a SQLite
+    file shared by all workers; otherwise they live in process memory.
+    """
+    global _default_cache
+    if not enabled:
+        _default_cache = None
+        return None
+    if path:
+        backend = SQLiteBackend(path, max_entries=max_entries, ttl=ttl)
+    else:
+        backend = MemoryBackend(max_entries=max_entries, ttl=ttl)
+    _default_cache = TileCache(backend, tile_size=tile_size)
+    return _default_cache
+
+
+def get_tile_cache():
+    return _default_cache
@@ -0,0 +1,233 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.osm import BUSINESS_TYPES, TAG_KEYS
+from utils.overpass_stream import iter_elements
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# Status codes worth retrying: rate limited, or the server is busy/restarting.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OverpassError(Exception):
+    """An Overpass request failed after all retries, or ran out of time."""
+
+
+def build_query(area, business_types=BUSINESS_TYPES, timeout=None):
+    """
+    Builds an Overpass query for the given business types.
+
+    :param area: Overpass area filter, e.g. "around:800,44.97,-93.26" or a
+                 "south,west,north,east" bounding box.
+    :param business_types: OSM tag values to search for.
+    :param timeout: Server-side timeout in seconds, if any.
+    :return: Overpass QL query string.
+    """
+    query_parts = []
+    for business_type in business_types:
+        key = TAG_KEYS.get(business_type, "shop")  # amenity for food, shop for stores
+        for element_type in ("node", "way", "relation"):
+            query_parts.append(f'{element_type}["{key}"="{business_type}"]({area});')
+
+    settings = "[out:json]" + (f"[timeout:{int(timeout)}]" if timeout else "")
+    return f"""
+    {settings};
+    (
+      {"".join(query_parts)}
+    );
+    out center;
+    """
+
+
+class OverpassClient:
+    """
+    Pooled Overpass client.
+
+    Every query covers all business types, so a cache rectangle or an
+    `around` search costs one upstream request; the rectangles of one lookup
+    run concurrently and their elements are merged by OSM id. Requests go
+    over one pooled requests.Session, at most max_concurrent at a time per
+    process: public Overpass gives each IP about two query slots, and more
+    parallel requests only get rate-limited. Each request is retried with
+    exponential backoff, and the whole call is bounded by `deadline` seconds.
+    """
+
+    def __init__(self, url=OVERPASS_URL, timeout=25.0, connect_timeout=3.05, retries=3, backoff=0.5,
+                 deadline=45.0, max_concurrent=2):
+        self.url = url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.max_concurrent = max_concurrent
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrent)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def close(self):
+        self.session.close()
+
+    def _acquire_slot(self, deadline_at):
+        if not self._slots.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+            raise OverpassError("Overpass query failed: deadline exceeded waiting for a free slot")
+
+    # ----------------------------
+    # Single request
+    # ----------------------------
+    def query(self, query, deadline_at=None):
+        """
+        Runs one Overpass query with bounded retries.
+
+        :return: List of elements.
+        :raises OverpassError: When every attempt failed or the deadline passed.
+        """
+        deadline_at = deadline_at or time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            self._acquire_slot(deadline_at)
+            try:
+                response = self.session.post(self.url, data={"data": query},
+                                             timeout=(self.connect_timeout, min(self.timeout, remaining)))
+                if response.status_code in RETRY_STATUSES:
+                    last_error = OverpassError(f"HTTP {response.status_code}")
+                else:
+                    response.raise_for_status()
+                    data = response.json()
+                    if not isinstance(data, dict):
+                        raise OverpassError(f"unexpected response body: {type(data).__name__}")
+                    if "elements" not in data:
+                        raise OverpassError(data.get("remark", "response has no elements"))
+                    return data["elements"]
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                last_error = e
+            except requests.HTTPError as e:
+                raise OverpassError(str(e)) from e
+            finally:
+                self._slots.release()
+
+            # Exponential backoff with jitter, never past the deadline.
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            if time.monotonic() + delay >= deadline_at:
+                break
+            time.sleep(delay)
+        raise OverpassError(f"Overpass query failed: {last_error or 'deadline exceeded'}")
+
+    def stream(self, query, chunk_size=65536):
+        """
+        Runs one Overpass query and yields elements as the body arrives,
+        without holding the whole payload. Retries only happen before the
+        first byte of a successful response has been read. The request keeps
+        its slot until the body has been read or the generator is closed.
+        """
+        deadline_at = time.monotonic() + self.deadline
+        last_error = None
+        response = None
+        for attempt in range(self.retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            self._acquire_slot(deadline_at)
+            try:
+                attempt_response = self.session.post(self.url, data={"data": query}, stream=True,
+                                                     timeout=(self.connect_timeout, min(self.timeout, remaining)))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._slots.release()
+                last_error = e
+            else:
+                if attempt_response.status_code not in RETRY_STATUSES:
+                    response = attempt_response
+                    break
+                attempt_response.close()
+                self._slots.release()
+                last_error = OverpassError(f"HTTP {attempt_response.status_code}")
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            if time.monotonic() + delay >= deadline_at:
+                break
+            time.sleep(delay)
+        if response is None:
+            raise OverpassError(f"Overpass query failed: {last_error or 'deadline exceeded'}")
+
+        try:
+            with response:
+                response.raise_for_status()
+                yield from iter_elements(response.iter_content(chunk_size=chunk_size))
+        except (requests.RequestException, ValueError) as e:
+            raise OverpassError(f"Overpass stream failed: {e!r}") from e
+        finally:
+            self._slots.release()
+
+    def stream_around(self, radius, latitude, longitude, business_types=BUSINESS_TYPES):
+        """Streams elements within radius meters of a point from a single query."""
+        return self.stream(build_query(f"around:{radius},{latitude},{longitude}", business_types, self.timeout))
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def fetch_bbox(self, bbox, business_types=BUSINESS_TYPES):
+        """Elements of every business type inside a (south, west, north, east) box, from one query."""
+        area = ",".join(f"{v:.7f}" for v in bbox)
+        return self.query(build_query(area, business_types, self.timeout))
+
+    def fetch_bboxes(self, bboxes, business_types=BUSINESS_TYPES):
+        """
+        Elements of every business type inside any of several boxes, one query per
+        box, run up to max_concurrent at a time under one shared deadline.
+
+        :param bboxes: (south, west, north, east) boxes, e.g. the missing rectangles of a lookup.
+        :return: Elements merged by OSM id (an element in two boxes appears once).
+        :raises OverpassError: If any of the queries fails.
+        """
+        deadline_at = time.monotonic() + self.deadline
+        queries = [build_query(",".join(f"{v:.7f}" for v in bbox), business_types, self.timeout) for bbox in bboxes]
+        if len(queries) <= 1:
+            results = [self.query(q, deadline_at) for q in queries]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(queries), self.max_concurrent)) as executor:
+                futures = [executor.submit(self.query, q, deadline_at) for q in queries]
+                try:
+                    results = [future.result() for future in futures]
+                finally:
+                    for future in futures:
+                        future.cancel()
+        merged = {}
+        for elements in results:
+            merged.update(((e.get("type"), e.get("id")), e) for e in elements)
+        return list(merged.values())
+
+    def fetch_around(self, radius, latitude, longitude, business_types=BUSINESS_TYPES):
+        """Elements of every business type within radius meters of a point, from one query."""
+        return self.query(build_query(f"around:{radius},{latitude},{longitude}", business_types, self.timeout))
+
+
+# ----------------------------
+# Process-wide default client
+# ----------------------------
+_default_client = None  # built on first use
+
+
+def configure_overpass_client(**kwargs):
+    """Replaces the default client, e.g. to point it at a stand-in server."""
+    global _default_client
+    if _default_client is not None:
+        _default_client.close()
+    _default_client = OverpassClient(**kwargs)
+    return _default_client
+
+
+def get_overpass_client():
+    global _default_client
+    if _default_client is None:
+        _default_client = OverpassClient()
+    return _default_client
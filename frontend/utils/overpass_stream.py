@@ -0,0 +1,89 @@
+"""
+Streaming pipeline for large Overpass responses.
+
+Instead of response.json(), the body is decoded chunk by chunk and the
+"elements" array is yielded one element at a time. Each stage is a generator,
+so only the current chunk, the current batch of records and whatever the final
+consumer keeps (e.g. the top-k heaps in radius_calc) are held in memory:
+
+    chunks -> iter_elements -> iter_records -> with_distances -> top-k
+"""
+import codecs
+import json
+from itertools import islice
+
+from utils.geo import haversine_miles
+from utils.osm import parse_element
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_elements(chunks, key="elements"):
+    """
+    Yields the items of the top-level `key` array from a stream of JSON text chunks.
+
+    :param chunks: Iterable of str or bytes (UTF-8) chunks.
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buffer = ""
+    chunks = iter(chunks)
+    marker = f'"{key}"'
+
+    # Find the start of the array.
+    while True:
+        start = buffer.find(marker)
+        if start != -1:
+            bracket = buffer.find("[", start + len(marker))
+            if bracket != -1:
+                buffer = buffer[bracket + 1:]
+                break
+            buffer = buffer[start:]
+        else:
+            buffer = buffer[-len(marker):]  # the marker may straddle two chunks
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError(f"No {key!r} array in response")
+        buffer += decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    # Decode one item at a time, refilling the buffer as needed.
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE + ",":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except ValueError:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("Truncated Overpass response")
+            buffer = buffer[pos:] + (decode(chunk) if isinstance(chunk, bytes) else chunk)
+            pos = 0
+            continue
+        yield item
+        pos = end
+        if pos > 65536:
+            buffer, pos = buffer[pos:], 0
+
+
+def iter_records(elements):
+    """Projects elements down to the fields we use, dropping ones without coordinates."""
+    for element in elements:
+        record = parse_element(element)
+        if record["latitude"] is not None and record["longitude"] is not None:
+            yield record
+
+
+def with_distances(records, latitude, longitude, batch_size=1024):
+    """Adds distance (miles) to each record, vectorized over small batches."""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        dists = haversine_miles(latitude, longitude, [r["latitude"] for r in batch], [r["longitude"] for r in batch])
+        for record, dist in zip(batch, dists):
+            record["distance"] = float(dist)
+            yield record
@@ -0,0 +1,72 @@
+"""
+Password hashing and verification in a dedicated process pool.
+
+A Werkzeug scrypt hash costs about a tenth of a second of CPU. Run on the
+request threads, a burst of logins takes every core and listing requests
+queue up behind it. PasswordHasher sends the work to a small pool of
+processes instead. The pool's size caps how many cores hashing can use, and
+the waiting request thread holds no CPU. The pool is started on first use.
+"""
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher:
+    """generate/check_password_hash with a fixed method, run in worker processes."""
+
+    def __init__(self, workers=1, method="scrypt:32768:8:1", salt_length=16, timeout=30.0):
+        """
+        :param workers: Hashing processes; 0 hashes on the calling thread.
+        :param method: Werkzeug hash method with its parameters, e.g. "scrypt:32768:8:1"
+                       or "pbkdf2:sha256:1000000". Spell out the parameters: stored hashes
+                       whose prefix differs are re-hashed on the next login.
+        :param salt_length: Characters of salt per hash.
+        :param timeout: Seconds to wait for a worker before giving up.
+        """
+        self.workers = workers
+        self.method = method
+        self.salt_length = salt_length
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # spawn: the app has threads running, which fork does not mix well with.
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            return self._executor().submit(fn, *args).result(self.timeout)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call.
+            with self._lock:
+                self._pool = None
+            raise
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with a different method or parameters than this hasher's."""
+        return pwhash.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
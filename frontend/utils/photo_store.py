@@ -0,0 +1,98 @@
+"""
+Content-addressed photo storage on disk.
+
+Uploads are copied to a temporary file chunk by chunk while their SHA-256 is
+computed, then renamed to <root>/<first two hex digits>/<digest>. A photo
+that is already stored is not written twice; the temporary copy is dropped.
+Callers that record the digest in a database stage the upload first and
+publish it only after their commit succeeds.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class PhotoStore:
+    """Photos on disk, named by the SHA-256 of their bytes."""
+
+    def __init__(self, root, chunk_size=64 * 1024, max_bytes=None):
+        """
+        :param root: Directory to store photos under (created on first save).
+        :param chunk_size: Bytes read from an upload at a time.
+        :param max_bytes: Largest photo accepted, or None for no limit.
+        """
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+
+    def path(self, digest):
+        if not _DIGEST.match(digest or ""):
+            raise ValueError(f"Not a photo digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def __contains__(self, digest):
+        return bool(_DIGEST.match(digest or "")) and os.path.exists(self.path(digest))
+
+    def save(self, stream):
+        """
+        Stores the bytes read from stream (any object with read(size)).
+
+        :return: (hex digest, size in bytes, True if the photo was new).
+        :raises ValueError: If the photo is empty or larger than max_bytes.
+        """
+        digest, size, tmp_path = self.stage(stream)
+        return digest, size, self.publish(digest, tmp_path)
+
+    def stage(self, stream):
+        """
+        Copies and hashes an upload without storing it yet, so a caller can
+        publish it once the row that refers to it is committed.
+
+        :return: (hex digest, size in bytes, temporary path for publish or discard).
+        :raises ValueError: If the photo is empty or larger than max_bytes.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if self.max_bytes is not None and size > self.max_bytes:
+                        raise ValueError(f"Photo is larger than {self.max_bytes} bytes")
+                    sha.update(chunk)
+                    out.write(chunk)
+            if size == 0:
+                raise ValueError("Photo is empty")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return sha.hexdigest(), size, tmp_path
+
+    def publish(self, digest, tmp_path):
+        """
+        Moves a staged upload to its place in the store.
+
+        :return: True if the photo was new.
+        """
+        path = self.path(digest)
+        if os.path.exists(path):
+            self.discard(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)  # atomic; a concurrent save of the same photo just overwrites it
+        return True
+
+    def discard(self, tmp_path):
+        """Drops a staged upload."""
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
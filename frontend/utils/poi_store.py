@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from utils.geo import EARTH_RADIUS_MILES, haversine_miles
+from utils.osm import BUSINESS_TYPES, parse_element
+
+STORE_FORMAT = 1
+
+
+class POIStore:
+    """
+    Offline store of businesses with a lat/lon grid index.
+
+    Records are kept as parallel NumPy arrays; the grid maps a (row, col) cell
+    of cell_size degrees to the indices of the records inside it, so radius and
+    k-nearest queries only look at the cells around the query point. Types are
+    stored as integer codes with per-type counts, so a typed query filters the
+    cells it visits instead of the whole store.
+    """
+
+    def __init__(self, records, cell_size=0.01, version=None):
+        self.cell_size = float(cell_size)
+        self.version = version
+        self.records = [r for r in records if r.get("latitude") is not None and r.get("longitude") is not None]
+        self.lats = np.array([r["latitude"] for r in self.records], dtype=float)
+        self.lons = np.array([r["longitude"] for r in self.records], dtype=float)
+        self.type_index = {}
+        self.type_codes = np.fromiter((self.type_index.setdefault(r["type"], len(self.type_index)) for r in self.records),
+                                      dtype=np.int64, count=len(self.records))
+        self.type_counts = np.bincount(self.type_codes, minlength=len(self.type_index))
+
+        self.grid = defaultdict(list)
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self.grid[self._cell(lat, lon)].append(i)
+        self.grid = {cell: np.array(ids, dtype=np.int64) for cell, ids in self.grid.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def _ring(self, center, ring):
+        """Indices of all records in the square ring of cells `ring` steps away from center."""
+        row, col = center
+        ids = []
+        for r in range(row - ring, row + ring + 1):
+            for c in range(col - ring, col + ring + 1):
+                if ring and abs(r - row) != ring and abs(c - col) != ring:
+                    continue
+                cell_ids = self.grid.get((r, c))
+                if cell_ids is not None:
+                    ids.append(cell_ids)
+        return np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+
+    def _ring_miles(self, latitude, ring):
+        """Lower bound on the distance to anything outside `ring` rings of cells."""
+        coslat = max(math.cos(math.radians(abs(latitude) + ring * self.cell_size)), 1e-6)
+        return math.radians(ring * self.cell_size) * EARTH_RADIUS_MILES * coslat
+
+    def _rows(self, ids, dists):
+        return [dict(self.records[i], distance=float(d)) for i, d in zip(ids, dists)]
+
+    def within(self, latitude, longitude, radius_miles, business_types=None):
+        """
+        All records within radius_miles of a point, nearest first.
+
+        :return: List of record dicts with a distance field (miles).
+        """
+        center = self._cell(latitude, longitude)
+        rings = 0
+        while self._ring_miles(latitude, rings) < radius_miles and rings < 360 / self.cell_size:
+            rings += 1
+        ids = np.concatenate([self._ring(center, r) for r in range(rings + 1)])
+        ids = self._filter_types(ids, business_types)
+
+        dists = haversine_miles(latitude, longitude, self.lats[ids], self.lons[ids])
+        keep = dists <= radius_miles
+        ids, dists = ids[keep], dists[keep]
+        order = np.argsort(dists, kind="stable")
+        return self._rows(ids[order], dists[order])
+
+    def nearest(self, latitude, longitude, k, business_types=None):
+        """
+        The k records closest to a point, nearest first.
+
+        :return: List of record dicts with a distance field (miles).
+        """
+        center = self._cell(latitude, longitude)
+        ids = np.empty(0, dtype=np.int64)
+        dists = np.empty(0, dtype=float)
+        if business_types is None:
+            available = len(self)
+        else:
+            available = int(sum(self.type_counts[self.type_index[t]] for t in set(business_types) if t in self.type_index))
+        k = min(k, available)
+        ring = 0
+        while k > 0:
+            ring_ids = self._filter_types(self._ring(center, ring), business_types)
+            if len(ring_ids):
+                ids = np.concatenate([ids, ring_ids])
+                dists = np.concatenate([dists, haversine_miles(latitude, longitude, self.lats[ring_ids], self.lons[ring_ids])])
+            # Stop once the k-th best can't be beaten by anything further out.
+            if len(ids) >= k and np.partition(dists, k - 1)[k - 1] <= self._ring_miles(latitude, ring):
+                break
+            if len(ids) == available:
+                break
+            ring += 1
+
+        order = np.argsort(dists, kind="stable")[:k]
+        return self._rows(ids[order], dists[order])
+
+    def _filter_types(self, ids, business_types):
+        if business_types is None or not len(ids):
+            return ids
+        wanted = [self.type_index[t] for t in set(business_types) if t in self.type_index]
+        return ids[np.isin(self.type_codes[ids], wanted)]
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+    @classmethod
+    def load(cls, path, cell_size=0.01):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["records"], cell_size=cell_size, version=data.get("version"))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT, "version": self.version, "records": self.records}, f)
+
+
+def import_overpass_extracts(paths, out_path, business_types=BUSINESS_TYPES):
+    """
+    Loads Overpass/OSM JSON extracts into a sidecar store file.
+
+    Elements are deduplicated by OSM id and filtered to the business types we
+    serve. An existing store at out_path is merged with the new extracts.
+
+    :param paths: Overpass JSON files (the `[out:json]; ... out center;` format).
+    :param out_path: Sidecar store file to write.
+    :return: Number of records in the written store.
+    """
+    records = {}
+    if os.path.exists(out_path):
+        for record in POIStore.load(out_path).records:
+            records[record["osm_id"]] = record
+
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for element in data.get("elements", []):
+            record = parse_element(element)
+            if record["type"] in business_types and record["latitude"] is not None:
+                records[record["osm_id"]] = record
+
+    version = max((os.path.getmtime(p) for p in paths), default=0)
+    store = POIStore(list(records.values()), version=f"{len(records)}-{int(version)}")
+    store.save(out_path)
+    return len(store)
+
+
+# ----------------------------
+# Process-wide default store
+# ----------------------------
+_default_store = None
+
+
+def configure_poi_store(path, cell_size=0.01):
+    """Loads the sidecar store at path and makes it the default for get_nearby_businesses."""
+    global _default_store
+    _default_store = POIStore.load(path, cell_size=cell_size) if path else None
+    return _default_store
+
+
+def get_poi_store():
+    return _default_store
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.poi_store import OUT.json EXTRACT.json [EXTRACT.json ...]
+    if len(sys.argv) < 4 or sys.argv[1] != "import":
+        print("Usage: python -m utils.poi_store import OUT.json EXTRACT.json [EXTRACT.json ...]")
+        sys.exit(1)
+    count = import_overpass_extracts(sys.argv[3:], sys.argv[2])
+    print(f"Wrote {count} businesses to {sys.argv[2]}")
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+import traceback
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class PrefetchQueue:
+    """
+    Small background job runner for warming caches.
+
+    Jobs go into a bounded queue served by a fixed set of daemon threads,
+    started by the first submit so that merely importing the app (CLI
+    commands, migrations, benchmarks) starts none. Jobs are deduplicated by key: submitting a key that is already queued or
+    running is a no-op, and when the queue is full new jobs are dropped
+    rather than blocking the request that submitted them.
+    """
+
+    def __init__(self, workers=2, max_queued=256, keep_status=1024):
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._status = {}
+        self._lock = threading.Lock()
+        self._keep_status = keep_status
+        self._closed = False
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.workers = workers
+        self._threads = []  # started on first submit
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) under key.
+
+        :return: True if queued, False if a job for key is pending or the queue is full/closed.
+        """
+        with self._lock:
+            if self._closed or self._status.get(key, (None,))[0] in (QUEUED, RUNNING):
+                return False
+            try:
+                self._queue.put_nowait((key, fn, args, kwargs))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._set(key, QUEUED)
+            self.submitted += 1
+            if not self._threads:
+                self._start()
+            return True
+
+    def _start(self):
+        self._threads = [threading.Thread(target=self._work, name=f"prefetch-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def status(self, key):
+        """QUEUED, RUNNING, DONE, FAILED or None if the key was never (or long ago) submitted."""
+        with self._lock:
+            return self._status.get(key, (None,))[0]
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for state, _ in self._status.values() if state == RUNNING)
+            return {
+                "queue_depth": self._queue.qsize(),
+                "running": running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "workers": len(self._threads),  # 0 until the first job
+            }
+
+    def shutdown(self, wait=True, cancel_pending=True, timeout=None):
+        """
+        Stops accepting jobs; optionally drops the queued ones and waits for
+        running jobs to finish.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if cancel_pending:
+                while True:
+                    try:
+                        key, *_ = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._status.pop(key, None)
+                    self._queue.task_done()
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for thread in threads:
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def _set(self, key, state):
+        self._status[key] = (state, time.time())
+        if len(self._status) > self._keep_status:
+            # Forget the oldest finished jobs.
+            finished = sorted((t, k) for k, (s, t) in self._status.items() if s in (DONE, FAILED))
+            for _, old_key in finished[:len(self._status) - self._keep_status]:
+                del self._status[old_key]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                key, fn, args, kwargs = job
+                with self._lock:
+                    self._set(key, RUNNING)
+                try:
+                    fn(*args, **kwargs)
+                except Exception:
+                    traceback.print_exc()
+                    with self._lock:
+                        self._set(key, FAILED)
+                        self.failed += 1
+                else:
+                    with self._lock:
+                        self._set(key, DONE)
+                        self.completed += 1
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,100 @@
+"""
+Batch proximity between users and shops on a k-d tree.
+
+Points are mapped to unit-sphere xyz, where straight-line (chord) distance is
+monotonic in great-circle distance, so an ordinary Euclidean k-d tree gives
+exact haversine neighbours:
+
+    chord = 2 * sin(d / 2R)        d = 2R * arcsin(chord / 2)
+
+Queries are cut into chunks and spread over a process pool; each worker
+builds the tree once in its initializer and then answers chunk after chunk.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.geo import EARTH_RADIUS_MILES
+
+_tree = None  # per-worker tree, set by _init_worker
+
+
+def to_unit_xyz(lats, lons):
+    """(n, 3) unit-sphere coordinates for arrays of latitudes/longitudes in degrees."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def miles_to_chord(miles):
+    return 2 * np.sin(np.minimum(np.asarray(miles, dtype=np.float64) / (2 * EARTH_RADIUS_MILES), np.pi / 2))
+
+
+def chord_to_miles(chord):
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def _init_worker(points):
+    global _tree
+    _tree = cKDTree(points)
+
+
+def _nearest_chunk(args):
+    points, k = args
+    chords, idx = _tree.query(points, k=k)
+    return chord_to_miles(chords).reshape(len(points), k), np.asarray(idx).reshape(len(points), k)
+
+
+def _count_chunk(args):
+    points, chords = args
+    return _tree.query_ball_point(points, chords, return_length=True)
+
+
+def _map_chunks(tree_points, fn, chunks, workers):
+    """Runs fn over chunks against a tree of tree_points, in-process or on a pool."""
+    if workers <= 1 or len(chunks) <= 1:
+        _init_worker(tree_points)
+        return [fn(chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tree_points,)) as pool:
+        return list(pool.map(fn, chunks))
+
+
+def _workers(workers):
+    return workers if workers is not None else (os.cpu_count() or 1)
+
+
+def nearest_shops(user_lats, user_lons, shop_lats, shop_lons, k=10, chunk_size=100_000, workers=None):
+    """
+    The k nearest shops for every user.
+
+    :return: (distances in miles, shop indices), each of shape (users, k), nearest
+             first. If there are fewer than k shops the missing slots have
+             distance inf and index len(shops).
+    """
+    users = to_unit_xyz(user_lats, user_lons)
+    shops = to_unit_xyz(shop_lats, shop_lons)
+    if len(users) == 0 or len(shops) == 0 or k <= 0:
+        return np.full((len(users), max(k, 0)), np.inf), np.full((len(users), max(k, 0)), len(shops))
+    chunks = [(users[i:i + chunk_size], k) for i in range(0, len(users), chunk_size)]
+    results = _map_chunks(shops, _nearest_chunk, chunks, _workers(workers))
+    return np.concatenate([d for d, _ in results]), np.concatenate([i for _, i in results])
+
+
+def coverage_counts(shop_lats, shop_lons, radii_miles, user_lats, user_lons, chunk_size=20_000, workers=None):
+    """
+    Number of users within each shop's radius.
+
+    :param radii_miles: One radius for every shop, or an array with one per shop.
+    :return: Integer array with one count per shop.
+    """
+    shops = to_unit_xyz(shop_lats, shop_lons)
+    users = to_unit_xyz(user_lats, user_lons)
+    chords = np.broadcast_to(miles_to_chord(radii_miles), (len(shops),))
+    if len(shops) == 0 or len(users) == 0:
+        return np.zeros(len(shops), dtype=np.int64)
+    chunks = [(shops[i:i + chunk_size], chords[i:i + chunk_size]) for i in range(0, len(shops), chunk_size)]
+    results = _map_chunks(users, _count_chunk, chunks, _workers(workers))
+    return np.concatenate(results).astype(np.int64)
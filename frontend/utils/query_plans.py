@@ -0,0 +1,61 @@
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# "SCAN transactions" is a full table scan; "SCAN t USING INDEX ..." and
+# "SEARCH t USING ..." are index lookups, and "SCAN 2 CONSTANT ROWS" reads
+# an INSERT's VALUES list.
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(?!(?:\d+ )?CONSTANT ROWS?\b)(\w+)(?!.*\bUSING\b)")
+
+
+@contextmanager
+def record_statements(engine):
+    """
+    Collects every (statement, parameters) the engine executes inside the block.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(connection, statement, parameters=()):
+    """
+    :return: The detail lines of SQLite's EXPLAIN QUERY PLAN for a statement.
+    """
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    """Tables the plan reads with a full table scan."""
+    return [m.group(1) for m in (_FULL_SCAN.match(detail) for detail in plan) if m]
+
+
+def check_statements(connection, statements, allowed_tables=()):
+    """
+    Runs EXPLAIN QUERY PLAN over recorded statements.
+
+    :param statements: (statement, parameters) pairs, e.g. from record_statements.
+    :param allowed_tables: Tables that may be scanned (tiny lookup tables).
+    :return: List of (statement, plan, scanned tables) for every offending statement.
+    """
+    failures = []
+    seen = set()
+    for statement, parameters in statements:
+        if statement in seen:
+            continue
+        seen.add(statement)
+        plan = explain(connection, statement, parameters)
+        scanned = [t for t in full_scans(plan) if t not in allowed_tables]
+        if scanned:
+            failures.append((statement, plan, scanned))
+    return failures
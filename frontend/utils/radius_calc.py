@@ -1,28 +1,119 @@
-import pandas as pd
+import heapq
+
 import numpy as np
-from scipy.spatial import distance
 
-# Load the data
+from utils.osm import COLUMNS
+
+
+def factorize(values):
+    """
+    Integer codes for values, numbered in order of first appearance.
+
+    :return: (codes array, list of distinct values).
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def select_top_k(types, distances, threshold=16, thresholds=None):
+    """
+    Picks the nearest `threshold` rows of every type without sorting the whole input.
+
+    Rows are grouped by type with one hash pass and an integer argsort, then
+    each group is cut down with argpartition; only the selected rows are
+    sorted by distance. Ties go to the earlier row, as with a stable sort.
+
+    :param types: Array of type labels, one per row.
+    :param distances: Array of distances, one per row.
+    :param threshold: Rows to keep for types not listed in thresholds.
+    :param thresholds: Optional {type: count} overriding threshold per type.
+    :return: Row indices, grouped by type in order of first appearance, nearest first.
+    """
+    types = np.asarray(types, dtype=object)
+    distances = np.asarray(distances, dtype=float)
+    if len(types) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    codes, labels = factorize(types)
+    by_code = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=len(labels)))
+
+    selected = []
+    for code in range(len(labels)):
+        start = bounds[code - 1] if code else 0
+        group = by_code[start:bounds[code]]
+        k = (thresholds or {}).get(labels[code], threshold)
+        if k <= 0:
+            continue
+        if len(group) > k:
+            # argpartition is not stable, so keep every row tied with the k-th
+            # distance; the stable sort below then breaks ties by row order,
+            # as a full stable sort would.
+            kth = distances[group][np.argpartition(distances[group], k - 1)[k - 1]]
+            group = group[distances[group] <= kth]
+        selected.append(group[np.argsort(distances[group], kind="stable")][:k])
+    return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+
 
 # Function to calculate the number of points within a radius for each class
-def find_radius(user_location, data, threshold=16):
-    req_counts = threshold
-    #  select top req_counts for each type of shop
-    shop_types = data['type'].unique()
-    
-    new_data = pd.DataFrame(columns=data.columns)
-    for shop_type in shop_types:
-        shop_data = data[data['type'] == shop_type]
-        shop_data = shop_data.sort_values(by='distance')
-        new_data = pd.concat([new_data, shop_data.head(req_counts)], ignore_index=True)
-        
+def find_radius(user_location, data, threshold=16, thresholds=None):
+    #  select top threshold (or thresholds[type]) for each type of shop
+    selected = select_top_k(data['type'].to_numpy(), data['distance'].to_numpy(), threshold, thresholds)
+    new_data = data.iloc[selected].reset_index(drop=True)
+
     best_radius = new_data['distance'].max()
     best_counts = new_data['type'].value_counts()
-    new_data = new_data.reset_index(drop=True)
-            
-            
+
+    return best_radius, best_counts, new_data
+
+def find_radius_stream(user_location, records, threshold=16, thresholds=None):
+    """
+    find_radius over a stream of records that already carry a distance.
+
+    Keeps a bounded max-heap of the nearest `threshold` (or thresholds[type])
+    records per type while consuming the stream, so memory stays at k per
+    type no matter how large the input is.
+
+    :param records: Iterable of record dicts with type and distance.
+    :return: (best_radius, best_counts, new_data), as find_radius.
+    """
+    import pandas as pd
+
+    new_data = pd.DataFrame(stream_top_k(records, threshold, thresholds), columns=COLUMNS)
+
+    best_radius = new_data['distance'].max()
+    best_counts = new_data['type'].value_counts()
+
     return best_radius, best_counts, new_data
 
+def stream_top_k(records, threshold=16, thresholds=None):
+    """
+    The records find_radius_stream keeps, as a list: grouped by type, types in
+    order of their nearest record, nearest first within a type.
+    """
+    heaps = {}
+    for seq, record in enumerate(records):
+        shop_type = record["type"]
+        k = (thresholds or {}).get(shop_type, threshold)
+        if k <= 0:
+            continue
+        heap = heaps.get(shop_type)
+        if heap is None:
+            heap = heaps[shop_type] = []
+        # Farthest kept record sits on top; ties keep the earlier record.
+        item = (-record["distance"], -seq, record)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    # Types in order of their nearest record, as find_radius does on distance-sorted input.
+    rows = []
+    for shop_type in sorted(heaps, key=lambda t: -max(heaps[t])[0]):
+        rows.extend(record for _, _, record in sorted(heaps[shop_type], reverse=True))
+    return rows
+
 # # Example usage
 # radius, counts = find_radius(user_location, data)
 
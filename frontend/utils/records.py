@@ -0,0 +1,116 @@
+"""
+pandas-free record pipeline for the request path:
+
+    parsed records -> NearbySet.from_records (distance, sort)
+                   -> .top_k (nearest per type)
+                   -> .rows() (dicts for JSON/templates and snapshots)
+
+A NearbySet keeps each column as one array (NumPy for the numbers, object
+arrays for the strings), so distance, sorting and selection are vectorized
+without building a DataFrame for a result of a few dozen rows. to_frame()
+converts to pandas for analytics code, importing it only then.
+"""
+import math
+from collections import Counter
+
+import numpy as np
+from geopy.distance import geodesic
+
+from utils.geo import haversine_miles
+from utils.osm import COLUMNS
+from utils.radius_calc import select_top_k
+
+
+class NearbySet:
+    """Businesses around a point, nearest first, with their distance in miles."""
+
+    __slots__ = ("names", "addresses", "types", "lats", "lons", "distances", "meta")
+
+    def __init__(self, names, addresses, types, lats, lons, distances, meta=None):
+        self.names = np.asarray(names, dtype=object)
+        self.addresses = np.asarray(addresses, dtype=object)
+        self.types = np.asarray(types, dtype=object)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.distances = np.asarray(distances, dtype=float)
+        self.meta = meta if meta is not None else {}
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [])
+
+    @classmethod
+    def from_records(cls, records, latitude, longitude, exact=False):
+        """
+        Computes distances for parsed records and sorts them, nearest first.
+
+        :param records: Records from osm.parse_element (no distance yet).
+        :param exact: Use geopy's geodesic distance instead of the vectorized haversine.
+        """
+        records = [r for r in records if r["latitude"] is not None and r["longitude"] is not None]
+        n = len(records)
+        names, addresses, types = [None] * n, [None] * n, [None] * n
+        lats, lons = np.empty(n, dtype=float), np.empty(n, dtype=float)
+        for i, record in enumerate(records):
+            names[i] = record["name"]
+            addresses[i] = record["address"]
+            types[i] = record["type"]
+            lats[i] = record["latitude"]
+            lons[i] = record["longitude"]
+
+        if exact:
+            dists = np.fromiter((geodesic((latitude, longitude), (lat, lon)).miles for lat, lon in zip(lats, lons)),
+                                dtype=float, count=n)
+        else:
+            dists = haversine_miles(latitude, longitude, lats, lons)
+
+        # Sort buisnesses by distance
+        order = np.argsort(dists, kind="stable")
+        return cls(np.asarray(names, dtype=object)[order], np.asarray(addresses, dtype=object)[order],
+                   np.asarray(types, dtype=object)[order], lats[order], lons[order], dists[order])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From dicts that already carry a distance (POI store, stream top-k), keeping their order."""
+        rows = list(rows)
+        return cls([r["name"] for r in rows], [r.get("address") for r in rows], [r["type"] for r in rows],
+                   [r["latitude"] for r in rows], [r["longitude"] for r in rows], [r["distance"] for r in rows])
+
+    def __len__(self):
+        return len(self.distances)
+
+    def take(self, index):
+        return NearbySet(self.names[index], self.addresses[index], self.types[index], self.lats[index],
+                         self.lons[index], self.distances[index], dict(self.meta))
+
+    def top_k(self, threshold=16, thresholds=None):
+        """The nearest `threshold` (or thresholds[type]) of each type, as find_radius selects them."""
+        return self.take(select_top_k(self.types, self.distances, threshold, thresholds))
+
+    @property
+    def best_radius(self):
+        """Distance to the farthest business kept, or NaN when empty."""
+        return float(self.distances.max()) if len(self) else math.nan
+
+    def counts(self):
+        """{type: count}, most common first."""
+        return dict(Counter(self.types.tolist()).most_common())
+
+    def rows(self):
+        """One dict per business with the COLUMNS fields, as DataFrame.to_dict(orient='records') gives."""
+        return [{"name": name, "address": address, "type": shop_type, "latitude": lat, "longitude": lon,
+                 "distance": dist}
+                for name, address, shop_type, lat, lon, dist
+                in zip(self.names.tolist(), self.addresses.tolist(), self.types.tolist(), self.lats.tolist(),
+                       self.lons.tolist(), self.distances.tolist())]
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame({
+            "name": self.names,
+            "address": self.addresses,
+            "type": self.types,
+            "latitude": self.lats,
+            "longitude": self.lons,
+            "distance": self.distances,
+        }, columns=COLUMNS)
@@ -0,0 +1,132 @@
+"""
+Per-user cache of rendered response bodies, validated by ETag.
+
+Each entry holds one route's body for one user, the ETag it was rendered
+for, and its compressed variants, built the first time a client asks for
+them (gzip always, brotli when the optional `brotli` package is installed).
+Repeat requests for an unchanged result skip both rendering and compression.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+
+def make_etag(*parts):
+    """A strong ETag value from everything the response depends on."""
+    return hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class CachedBody:
+    """One rendered body and its compressed variants."""
+
+    __slots__ = ("etag", "body", "mimetype", "_encoded")
+
+    def __init__(self, etag, body, mimetype):
+        self.etag = etag
+        self.body = body
+        self.mimetype = mimetype
+        self._encoded = {}
+
+    def encoded(self, encoding, gzip_level=6):
+        """The body in `encoding` ("br", "gzip" or None for identity), compressed once."""
+        if encoding is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(self.body)
+            elif encoding == "gzip":
+                data = gzip.compress(self.body, compresslevel=gzip_level, mtime=0)
+            else:
+                raise ValueError(f"Unsupported encoding {encoding!r}")
+            self._encoded[encoding] = data
+        return data
+
+
+class _Memo:
+    __slots__ = ("etag", "value")
+
+    def __init__(self, etag, value):
+        self.etag = etag
+        self.value = value
+
+
+class ResponseCache:
+    """
+    Rendered bodies per (user, route), least recently used users evicted first.
+
+    Entries are found by ETag, so a body rendered for an older state of the
+    user's data is never served; invalidate() just frees it early.
+    """
+
+    def __init__(self, max_users=1024, min_compress_size=1024, gzip_level=6):
+        self.max_users = max_users
+        self.min_compress_size = min_compress_size
+        self.gzip_level = gzip_level
+        self._by_user = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encodings(self):
+        """Content codings this cache can produce, preferred first."""
+        return ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def get(self, user_id, key, etag):
+        """The cached body for this user and route if it was rendered for etag, else None."""
+        with self._lock:
+            entries = self._by_user.get(user_id)
+            entry = entries.get(key) if entries else None
+            if entry is None or entry.etag != etag:
+                self.misses += 1
+                return None
+            self._by_user.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def put(self, user_id, key, etag, body, mimetype):
+        entry = CachedBody(etag, body if isinstance(body, bytes) else body.encode("utf-8"), mimetype)
+        self._store(user_id, key, entry)
+        return entry
+
+    def memo(self, user_id, key, etag, build):
+        """
+        A value derived from the same per-user state as the bodies (e.g. a cluster
+        index), rebuilt with build() when etag changes and dropped with them.
+        """
+        with self._lock:
+            entries = self._by_user.get(user_id)
+            entry = entries.get(key) if entries else None
+        if entry is not None and entry.etag == etag:
+            return entry.value
+        value = build()
+        self._store(user_id, key, _Memo(etag, value))
+        return value
+
+    def _store(self, user_id, key, entry):
+        with self._lock:
+            self._by_user.setdefault(user_id, {})[key] = entry
+            self._by_user.move_to_end(user_id)
+            while len(self._by_user) > self.max_users:
+                self._by_user.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._by_user.pop(user_id, None)
+
+    def body_for(self, entry, encoding):
+        """entry's body for a client accepting `encoding`; small bodies are sent uncompressed."""
+        if encoding is None or len(entry.body) < self.min_compress_size:
+            return entry.body, None
+        return entry.encoded(encoding, self.gzip_level), encoding
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._by_user.values())
@@ -0,0 +1,138 @@
+import base64
+import binascii
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class Snapshot:
+    """One user's computed nearby-business list, frozen for paging."""
+
+    __slots__ = ("id", "user_id", "coords", "rows", "meta", "created_at")
+
+    def __init__(self, user_id, coords, rows, meta=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.coords = coords
+        self.rows = rows
+        self.meta = meta or {}
+        self.created_at = time.time()
+
+
+class SnapshotStore:
+    """
+    Per-user result snapshots with TTL expiry.
+
+    A user has at most one live snapshot. It is replaced when it expires or
+    when the user's coordinates change (e.g. a new home address). Concurrent
+    get_or_create calls for the same user and coordinates share one
+    computation (e.g. a background prefetch and the first page request).
+    """
+
+    def __init__(self, ttl=600, max_snapshots=1024):
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self._by_user = OrderedDict()
+        self._by_id = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, snapshot, coords=None):
+        if snapshot is None or time.time() - snapshot.created_at > self.ttl:
+            return False
+        return coords is None or snapshot.coords == coords
+
+    def get(self, snapshot_id, user_id):
+        """The live snapshot with this id if it belongs to user_id, else None."""
+        with self._lock:
+            snapshot = self._by_id.get(snapshot_id)
+            if snapshot is None or snapshot.user_id != user_id or not self._fresh(snapshot):
+                return None
+            if self._by_user.get(user_id) is not snapshot:
+                return None
+            return snapshot
+
+    def peek(self, user_id, coords):
+        """The user's live snapshot for these coordinates, without computing one."""
+        with self._lock:
+            snapshot = self._by_user.get(user_id)
+            return snapshot if self._fresh(snapshot, coords) else None
+
+    def get_or_create(self, user_id, coords, compute):
+        """
+        The user's live snapshot for these coordinates, computing it if needed.
+
+        :param compute: Zero-argument callable returning the list of result rows,
+                        or (rows, meta) to attach extra details to the snapshot.
+        """
+        with self._lock:
+            snapshot = self._by_user.get(user_id)
+            if self._fresh(snapshot, coords):
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            pending = self._pending.get((user_id, coords))
+            if pending is None:
+                self._pending[(user_id, coords)] = threading.Event()
+
+        if pending is not None:
+            # Someone else is computing it; wait and use theirs if it landed.
+            pending.wait()
+            snapshot = self.peek(user_id, coords)
+            if snapshot is not None:
+                return snapshot
+            return self.put(user_id, coords, *self._unpack(compute()))
+
+        try:
+            return self.put(user_id, coords, *self._unpack(compute()))
+        finally:
+            with self._lock:
+                self._pending.pop((user_id, coords)).set()
+
+    @staticmethod
+    def _unpack(result):
+        return result if isinstance(result, tuple) else (result, None)
+
+    def put(self, user_id, coords, rows, meta=None):
+        snapshot = Snapshot(user_id, coords, rows, meta)
+        with self._lock:
+            self._drop(user_id)
+            self._by_user[user_id] = snapshot
+            self._by_id[snapshot.id] = snapshot
+            while len(self._by_user) > self.max_snapshots:
+                self._drop(next(iter(self._by_user)))
+        return snapshot
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._drop(user_id)
+
+    def _drop(self, user_id):
+        old = self._by_user.pop(user_id, None)
+        if old is not None:
+            self._by_id.pop(old.id, None)
+
+    def __len__(self):
+        return len(self._by_user)
+
+
+def encode_cursor(snapshot_id, offset):
+    """Opaque page cursor pointing at offset within a snapshot."""
+    raw = json.dumps({"s": snapshot_id, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    :return: (snapshot_id, offset), or None if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data["s"]), max(0, int(data["o"]))
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,159 @@
+"""
+Local stand-ins for the external HTTP APIs, for tests, benchmarks and load runs.
+
+Each stand-in is a threaded HTTP server on 127.0.0.1 with a random port,
+usable as a context manager:
+
+    with OverpassStandin(records) as overpass:
+        configure_overpass_client(url=overpass.url)
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from utils.geo import METERS_PER_MILE, haversine_miles
+from utils.geocoding import normalize_address
+
+_STATEMENT = re.compile(r'(node|way|relation)\["(\w+)"="([\w:]+)"\]\(([^)]*)\);')
+
+
+class _Standin:
+    def __init__(self):
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _params(self):
+                params = parse_qs(urlparse(self.path).query)
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update(parse_qs(self.rfile.read(length).decode()))
+                return {k: v[0] for k, v in params.items()}
+
+            def _reply(self):
+                standin.requests += 1
+                status, body = standin.handle(self._params())
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class OverpassStandin(_Standin):
+    """
+    Answers the Overpass queries built by overpass_client.build_query from an
+    in-memory list of business records (osm_id, name, type, latitude, ...).
+
+    :param delay: Seconds to sleep before each answer.
+    :param fail_first: Number of initial requests answered with HTTP 503.
+    """
+
+    path = "/api/interpreter"
+
+    def __init__(self, records, delay=0.0, fail_first=0):
+        super().__init__()
+        self.records = records
+        self.delay = delay
+        self.fail_first = fail_first
+
+    def handle(self, params):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.requests <= self.fail_first:
+            return 503, {"remark": "stand-in: try again"}
+
+        elements = {}
+        for element_type, key, value, area in _STATEMENT.findall(params.get("data", "")):
+            if element_type != "node":
+                continue  # every stand-in record is a node
+            for record in self._matching(key, value, area):
+                elements[record["osm_id"]] = self._element(record, key)
+        return 200, {"elements": list(elements.values())}
+
+    def _matching(self, key, value, area):
+        candidates = [r for r in self.records if r["type"] == value]
+        if not candidates:
+            return []
+        if area.startswith("around:"):
+            radius, lat, lon = (float(v) for v in area[len("around:"):].split(","))
+            dists = haversine_miles(lat, lon, [r["latitude"] for r in candidates], [r["longitude"] for r in candidates])
+            return [r for r, d in zip(candidates, dists) if d * METERS_PER_MILE <= radius]
+        south, west, north, east = (float(v) for v in area.split(","))
+        return [r for r in candidates if south <= r["latitude"] <= north and west <= r["longitude"] <= east]
+
+    @staticmethod
+    def _element(record, key):
+        element_id = int(str(record["osm_id"]).rsplit("/", 1)[-1])
+        tags = {key: record["type"], "name": record["name"]}
+        if record.get("address") and record["address"] != "Unknown Address":
+            tags["addr:street"] = record["address"]
+        return {"type": "node", "id": element_id, "lat": record["latitude"], "lon": record["longitude"], "tags": tags}
+
+
+class GeocodingStandin(_Standin):
+    """
+    Answers Google Geocoding API requests from a dict of address -> (lat, lng).
+    Point a GoogleMapsGeocoder at it with base_url=standin.url.
+
+    :param default: Coordinates returned for unknown addresses (ZERO_RESULTS if None).
+    :param delay: Seconds to sleep before each answer.
+    """
+
+    path = ""
+
+    def __init__(self, addresses, default=None, delay=0.0):
+        super().__init__()
+        self.addresses = {normalize_address(a): tuple(c) for a, c in addresses.items()}
+        self.default = default
+        self.delay = delay
+
+    def handle(self, params):
+        if self.delay:
+            time.sleep(self.delay)
+        address = params.get("address", "")
+        coords = self.addresses.get(normalize_address(address), self.default)
+        if coords is None:
+            return 200, {"status": "ZERO_RESULTS", "results": []}
+        lat, lng = coords
+        return 200, {"status": "OK", "results": [{
+            "formatted_address": address,
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+        }]}
@@ -0,0 +1,63 @@
+"""
+Cache of user rows for Flask-Login's user loader, which otherwise runs a
+SELECT on every authenticated request.
+
+Entries are plain column values, not ORM objects, so they can be shared
+between sessions and threads; the app turns one back into a User attached to
+the request's session. The app invalidates a user when their counters or
+profile change. Other worker processes only see such a change once their
+copy expires, so entries also carry a TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """Column values per user id, least recently used evicted first."""
+
+    def __init__(self, max_users=4096, ttl=10.0):
+        """
+        :param max_users: Users kept at most; 0 disables the cache.
+        :param ttl: Seconds an entry is trusted, bounding how stale another process's change can look.
+        """
+        self.max_users = max_users
+        self.ttl = ttl
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """The cached columns of user_id as a dict, or None."""
+        with self._lock:
+            entry = self._rows.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._rows[user_id]
+                self.misses += 1
+                return None
+            self._rows.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, user_id, row):
+        if self.max_users <= 0:
+            return
+        with self._lock:
+            self._rows[user_id] = (time.monotonic() + self.ttl, dict(row))
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > self.max_users:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
@@ -0,0 +1,11 @@
+"""
+Entry point for WSGI servers, e.g.
+
+    gunicorn -w 4 wsgi:app
+
+Builds the app without Flask-Migrate's commands, so a worker boots without
+importing Alembic. Use `flask --app app db ...` for migrations.
+"""
+from app import create_app
+
+app = create_app(migrations=False)